@@ -1,12 +1,95 @@
 import os
 import sys
+import time
 import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from langgraph.graph.state import CompiledStateGraph
 from psycopg_pool import AsyncConnectionPool
 from dotenv import load_dotenv
-from graph_builder import build_graph
+from graph_builder import (
+    build_graph,
+    compact_history,
+    needs_compaction,
+    turn_index_catch_up,
+    with_checkpointer,
+)
+from data.catalog import CatalogRepository, set_catalog
 from data.db_pool import create_async_pool
+from utils import metrics
+from utils.admission import admission
+from utils.llm_provider import get_llm, set_llm
+from utils.llm_scheduler import (
+    INTERACTIVE,
+    PRIORITY_CONFIG_KEY,
+    WEBHOOK,
+)
+from utils.thread_mailbox import thread_mailbox
+
+
+# "pool" borrows a connection only for each checkpoint read/write, so slow
+# LLM calls don't pin a pool slot; "pinned" holds one for the whole run.
+CHECKPOINT_CONNECTION_MODE = os.getenv("CHECKPOINT_CONNECTION_MODE", "pool").lower()
+
+CHECKPOINT_TABLES = ("checkpoints", "checkpoint_blobs", "checkpoint_writes")
+
+
+@dataclass
+class AgentRuntime:
+    """Long-lived objects shared by every conversation in the process."""
+
+    pool: AsyncConnectionPool
+    graph: CompiledStateGraph
+    catalog: CatalogRepository
+    llm: BaseChatModel
+    # Checkpoint tables that were still missing after the startup bootstrap.
+    missing_checkpoint_tables: list[str] = field(default_factory=list)
+
+
+async def setup_checkpoint_schema(pool: AsyncConnectionPool) -> list[str]:
+    """
+    Run the checkpointer migrations once and return the checkpoint tables
+    that are still missing afterwards (e.g. the DB user lacks create rights).
+    """
+    async with pool.connection() as conn:
+        try:
+            await AsyncPostgresSaver(conn).setup()
+        except Exception as e:
+            print(f"Checkpoint schema setup failed: {e}")
+        missing = await _missing_tables(conn, CHECKPOINT_TABLES)
+    if missing:
+        print(f"Checkpoint tables are missing: {', '.join(missing)}")
+    return missing
+
+
+async def build_runtime(pool: AsyncConnectionPool) -> AgentRuntime:
+    missing = await setup_checkpoint_schema(pool)
+
+    # Catalog queries used by the graph and tools share the runtime pool.
+    catalog = CatalogRepository(pool)
+    await catalog.start_snapshot()
+    set_catalog(catalog)
+
+    # Builds the LLM client, embeddings, tool vector store and compiled graph
+    # once; checkpointers are attached per invocation in run_agent.
+    started = time.perf_counter()
+    llm = get_llm()
+    set_llm(llm)
+    graph = build_graph(llm=llm)
+    elapsed = time.perf_counter() - started
+    metrics.set_gauge("graph_build_seconds", elapsed)
+    print(f"Graph built in {elapsed:.3f}s")
+    return AgentRuntime(
+        pool=pool,
+        graph=graph,
+        catalog=catalog,
+        llm=llm,
+        missing_checkpoint_tables=missing,
+    )
 
 
 def _normalize_from_number(raw: str) -> str:
@@ -40,31 +123,44 @@ def _build_run_config(from_number: str, channel: str) -> tuple[str, dict]:
     os.environ.setdefault("LANGCHAIN_TRACING_V2", "true")
     os.environ.setdefault("LANGCHAIN_PROJECT", f"{channel.capitalize()} Support Agent")
 
+    # Someone is watching a live socket; webhook replies can wait a little.
+    priority = INTERACTIVE if channel == "websocket" else WEBHOOK
     config = {
-        "configurable": {"thread_id": thread_id},
+        "configurable": {"thread_id": thread_id, PRIORITY_CONFIG_KEY: priority},
         "tags": ["support_agent", channel],
         "metadata": {"from_number": from_number},
     }
     return thread_id, config
 
 
-async def _table_exists(conn, table_name: str, schema: str = "public") -> bool:
+async def _missing_tables(
+    conn, table_names: tuple[str, ...], schema: str = "public"
+) -> list[str]:
     async with conn.cursor() as cur:
         await cur.execute(
             """
-            select exists(
-                select 1
-                from information_schema.tables
-                where table_schema = %s
-                  and table_name = %s
-            ) as exists
+            select table_name
+            from information_schema.tables
+            where table_schema = %s
+              and table_name = any(%s)
             """,
-            (schema, table_name),
+            (schema, list(table_names)),
         )
-        row = await cur.fetchone()
-        if not row:
-            return False
-        return bool(row.get("exists"))
+        rows = await cur.fetchall()
+    existing = {row.get("table_name") for row in rows}
+    return [name for name in table_names if name not in existing]
+
+
+@asynccontextmanager
+async def _thread_checkpointer(pool: AsyncConnectionPool):
+    if CHECKPOINT_CONNECTION_MODE == "pinned":
+        async with pool.connection() as conn:
+            yield AsyncPostgresSaver(conn)
+        return
+    # AsyncPostgresSaver checks a connection out of the pool per get/put and
+    # returns it straight away. A saver per run keeps its internal lock from
+    # serializing unrelated conversations.
+    yield AsyncPostgresSaver(pool)
 
 
 async def run_local_chat(
@@ -100,31 +196,19 @@ async def run_local_chat(
     return "\n\n".join(new_responses)
 
 
-async def run_agent(
-    user_message: str,
-    from_number: str,
-    pool: AsyncConnectionPool,
-    channel: str = "whatsapp",
+async def _clear_thread(
+    runtime: AgentRuntime, from_number: str, channel: str
 ) -> str:
-    async with pool.connection() as conn:
-        # Handle clear command
-        if user_message.strip() == "/clear":
-            required_tables = [
-                "checkpoints",
-                "checkpoint_blobs",
-                "checkpoint_writes",
-            ]
-            missing = []
-            for table in required_tables:
-                if not await _table_exists(conn, table):
-                    missing.append(table)
-            if missing:
-                missing_list = ", ".join(missing)
-                return (
-                    "Checkpoint tables are missing: "
-                    f"{missing_list}. Run the DB setup to create them."
-                )
-            thread_id = _build_thread_id(from_number, channel)
+    if runtime.missing_checkpoint_tables:
+        missing_list = ", ".join(runtime.missing_checkpoint_tables)
+        return (
+            "Checkpoint tables are missing: "
+            f"{missing_list}. Run the DB setup to create them."
+        )
+    thread_id = _build_thread_id(from_number, channel)
+    # Wait for an in-flight run so it can't write checkpoints after the wipe.
+    async with thread_mailbox.exclusive(thread_id):
+        async with runtime.pool.connection() as conn:
             await conn.execute(
                 "DELETE FROM checkpoints WHERE thread_id = %s", (thread_id,)
             )
@@ -134,20 +218,212 @@ async def run_agent(
             await conn.execute(
                 "DELETE FROM checkpoint_writes WHERE thread_id = %s", (thread_id,)
             )
-            return "Conversation history cleared."
+    return "Conversation history cleared."
+
+
+def _chunk_text(content) -> str:
+    if isinstance(content, list):
+        parts: list[str] = []
+        for part in content:
+            if isinstance(part, str):
+                parts.append(part)
+            elif isinstance(part, dict) and part.get("type", "text") == "text":
+                parts.append(str(part.get("text") or ""))
+        return "".join(parts)
+    return content or ""
+
+
+@dataclass
+class StreamReset:
+    """
+    Streamed in place of a chunk when text already sent turns out to be
+    tool-call planning: the reply so far is replaced by `text`.
+    """
+
+    text: str
+
+
+async def stream_local_chat(
+    graph, user_message: str, from_number: str, channel: str = "websocket"
+) -> AsyncIterator[str | StreamReset]:
+    """
+    Yield the assistant's reply text as the model generates it.
+
+    Some models write a sentence before deciding to call a tool, and the tool
+    call only shows up in a later chunk of the same message. When that
+    happens the message's text is retracted with a StreamReset.
+    """
+    _, config = _build_run_config(from_number, channel)
+
+    reply = ""
+    # Where the current message's text starts in reply.
+    message_start = 0
+    last_message_id = None
+    tool_call_messages: set[str | None] = set()
+    async for message, metadata in graph.astream(
+        {"messages": [HumanMessage(content=user_message)]},
+        config,
+        stream_mode="messages",
+    ):
+        # Only the assistant node talks to the user; summarization and the
+        # review summarizer inside the tools node stream tokens too.
+        if metadata.get("langgraph_node") != "assistant":
+            continue
+        if not isinstance(message, AIMessage):
+            continue
+        if message.id in tool_call_messages:
+            continue
+        # Skip tool-call planning output, and take back what was already sent.
+        if message.tool_calls or getattr(message, "tool_call_chunks", None):
+            tool_call_messages.add(message.id)
+            if message.id == last_message_id and len(reply) > message_start:
+                reply = reply[:message_start]
+                yield StreamReset(reply)
+            continue
+        text = _chunk_text(message.content)
+        if not text:
+            continue
+        if message.id != last_message_id:
+            last_message_id = message.id
+            message_start = len(reply)
+            if reply:
+                # Separate consecutive assistant messages like run_local_chat does.
+                text = "\n\n" + text
+        reply += text
+        yield text
+
+
+# Compactions in progress by thread (the tasks are kept referenced so they
+# aren't garbage collected mid-run).
+_compactions: dict[str, asyncio.Task] = {}
+
+
+async def _compact_thread(runtime: AgentRuntime, thread_id: str) -> None:
+    config = {"configurable": {"thread_id": thread_id}}
+    graph = with_checkpointer(runtime.graph, AsyncPostgresSaver(runtime.pool))
+    snapshot = await graph.aget_state(config)
+    if not needs_compaction(snapshot.values):
+        return
+
+    started = time.perf_counter()
+    update = await compact_history(runtime.llm, snapshot.values)
+    if not update:
+        return
+
+    # Only hold the thread while writing, and skip the write if a /clear
+    # removed the messages we summarized in the meantime.
+    async with thread_mailbox.exclusive(thread_id):
+        current = await graph.aget_state(config)
+        current_ids = {m.id for m in current.values.get("messages") or []}
+        if any(m.id not in current_ids for m in update["messages"]):
+            return
+        # Catch the turn index up with messages added meanwhile, then drop the
+        # summarized turns from it.
+        update["turn_index"] = [turn_index_catch_up(current.values), update["turn_index"]]
+        await graph.aupdate_state(config, update, as_node="compact_tool_results")
+    metrics.observe("compaction_seconds", time.perf_counter() - started)
+    print(
+        f"Compacted {len(update['messages'])} messages for {thread_id} "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+
+
+async def _run_compaction(runtime: AgentRuntime, thread_id: str) -> None:
+    try:
+        await _compact_thread(runtime, thread_id)
+    except Exception as e:
+        metrics.increment("compaction_failed")
+        print(f"Compaction failed for {thread_id}: {e}")
+    finally:
+        _compactions.pop(thread_id, None)
+
+
+def schedule_compaction(runtime: AgentRuntime, thread_id: str) -> None:
+    """
+    Summarize older turns in the background once the reply is out, so no
+    reply waits on a summarization LLM call.
+    """
+    if runtime.missing_checkpoint_tables or thread_id in _compactions:
+        return
+    _compactions[thread_id] = asyncio.create_task(_run_compaction(runtime, thread_id))
+
+
+async def wait_for_compaction(thread_ids) -> None:
+    """
+    Wait for this process's compactions of the given threads, so a caller
+    can keep a thread claimed until its checkpoint writes are done.
+    """
+    tasks = [_compactions[t] for t in thread_ids if t in _compactions]
+    if tasks:
+        await asyncio.wait(tasks)
 
-        memory = AsyncPostgresSaver(conn)
-        await memory.setup()
 
-        # Build and run the graph
-        graph = build_graph(checkpointer=memory)
+async def run_agent(
+    user_message: str,
+    from_number: str,
+    runtime: AgentRuntime,
+    channel: str = "whatsapp",
+) -> str | None:
+    """
+    Run one turn and return the reply, or None when the message was merged
+    into a turn that another caller for the same thread delivered. Raises
+    AgentBusyError when admission control rejects the run; a merged caller
+    gets the same exception as the turn that took its message.
+    """
+    # Handle clear command
+    if user_message.strip() == "/clear":
+        return await _clear_thread(runtime, from_number, channel)
+
+    thread_id = _build_thread_id(from_number, channel)
+    async with thread_mailbox.turn(thread_id, user_message) as merged_message:
+        if merged_message is None:
+            return None
 
-        # Properly consume the async generator
-        response = await run_local_chat(graph, user_message, from_number, channel)
-        print(f"Agent response: {response}")
+        # Raises AgentBusyError when the LLM backend is saturated.
+        async with admission.admit(), _thread_checkpointer(runtime.pool) as memory:
+            # Reuse the compiled graph with this conversation's checkpointer
+            graph = with_checkpointer(runtime.graph, memory)
+
+            # Properly consume the async generator
+            response = await run_local_chat(
+                graph, merged_message, from_number, channel
+            )
+            print(f"Agent response: {response}")
+        schedule_compaction(runtime, thread_id)
         return response
 
 
+async def stream_agent(
+    user_message: str,
+    from_number: str,
+    runtime: AgentRuntime,
+    channel: str = "websocket",
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of run_agent: yields reply text chunks as they arrive,
+    and a StreamReset when text already yielded is retracted. Yields nothing when the message was merged into another caller's turn.
+    """
+    if user_message.strip() == "/clear":
+        yield await _clear_thread(runtime, from_number, channel)
+        return
+
+    thread_id = _build_thread_id(from_number, channel)
+    async with thread_mailbox.turn(thread_id, user_message) as merged_message:
+        if merged_message is None:
+            return
+
+        async with admission.admit(), _thread_checkpointer(runtime.pool) as memory:
+            graph = with_checkpointer(runtime.graph, memory)
+            reply = ""
+            async for chunk in stream_local_chat(
+                graph, merged_message, from_number, channel
+            ):
+                reply = chunk.text if isinstance(chunk, StreamReset) else reply + chunk
+                yield chunk
+            print(f"Agent response: {reply}")
+        schedule_compaction(runtime, thread_id)
+
+
 if __name__ == "__main__":
     if sys.platform == "win32":
         # psycopg async doesn't work with ProactorEventLoop on Windows.
@@ -160,6 +436,7 @@ if __name__ == "__main__":
         print("Chat session started. Type '/clear' to reset conversation history.")
 
         async with create_async_pool() as pool:
+            runtime = await build_runtime(pool)
             while True:
                 try:
                     user_input = input("User: ")
@@ -167,7 +444,7 @@ if __name__ == "__main__":
                         print("Goodbye!")
                         break
 
-                    await run_agent(user_input, from_number, pool)
+                    await run_agent(user_input, from_number, runtime)
                 except KeyboardInterrupt:
                     print("\nGoodbye!")
                     break
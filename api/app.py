@@ -1,9 +1,16 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from agent import build_runtime
+from data.catalog_listener import start_catalog_listener
 from data.db_pool import create_async_pool
+from data.job_queue import setup_job_queue
 from api.routers.whatsapp import whatsapp_router
 from api.routers.telegram import telegram_router
 from api.routers.websocket import ws_router
+from api.services.dedup import setup_webhook_dedup
+from api.services.http_client import OutboundClient, set_http_client
+from api.services.outbound import telegram_outbound, whatsapp_outbound
+from utils import metrics
 
 
 @asynccontextmanager
@@ -11,9 +18,23 @@ async def lifespan(app: FastAPI):
     pool = create_async_pool()
     await pool.open()
     app.state.db_pool = pool
+    await setup_job_queue(pool)
+    await setup_webhook_dedup(pool)
+    app.state.runtime = await build_runtime(pool)
+    catalog_listener = await start_catalog_listener(pool, app.state.runtime.catalog)
+    http_client = OutboundClient()
+    set_http_client(http_client)
+    app.state.http_client = http_client
     try:
         yield
     finally:
+        if catalog_listener is not None:
+            await catalog_listener.stop()
+        await app.state.runtime.catalog.stop_snapshot()
+        await telegram_outbound.stop()
+        await whatsapp_outbound.stop()
+        await http_client.aclose()
+        set_http_client(None)
         await pool.close()
 
 
@@ -21,3 +42,8 @@ app = FastAPI(lifespan=lifespan)
 app.include_router(whatsapp_router, tags=["whatsapp"])
 app.include_router(telegram_router, tags=["telegram"])
 app.include_router(ws_router, tags=["websocket"])
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
@@ -1,5 +1,6 @@
 from fastapi import Request, WebSocket
 from psycopg_pool import AsyncConnectionPool
+from agent import AgentRuntime
 
 
 def get_db_pool(request: Request) -> AsyncConnectionPool:
@@ -8,3 +9,11 @@ def get_db_pool(request: Request) -> AsyncConnectionPool:
 
 def get_db_pool_ws(websocket: WebSocket) -> AsyncConnectionPool:
     return websocket.app.state.db_pool
+
+
+def get_runtime(request: Request) -> AgentRuntime:
+    return request.app.state.runtime
+
+
+def get_runtime_ws(websocket: WebSocket) -> AgentRuntime:
+    return websocket.app.state.runtime
@@ -1,12 +1,29 @@
 from fastapi import APIRouter, Request, HTTPException, Depends
-from fastapi.background import BackgroundTasks
 from dotenv import load_dotenv
+import asyncio
 import os
 
-from agent import run_agent
+import httpx
+
+from agent import (
+    AgentRuntime,
+    StreamReset,
+    _build_thread_id,
+    run_agent,
+    stream_agent,
+)
 from api.dependency import get_db_pool
-from api.services.telegram import send_telegram_message
+from api.services.dedup import webhook_dedup
+from data.job_queue import JobReplies, enqueue_job
 from psycopg_pool import AsyncConnectionPool
+from api.services.outbound import split_message, telegram_outbound
+from api.services.telegram import (
+    TELEGRAM_MAX_MESSAGE_CHARS,
+    edit_telegram_message,
+    edit_throttle,
+    send_chat_action,
+    send_telegram_message,
+)
 
 load_dotenv()
 
@@ -14,12 +31,14 @@ telegram_router = APIRouter()
 
 MAX_MESSAGE_LENGTH = int(os.getenv("MAX_MESSAGE_LENGTH", "1000"))
 TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+# "stream" edits a placeholder message as tokens arrive, "single" sends once.
+TELEGRAM_DELIVERY_MODE = os.getenv("TELEGRAM_DELIVERY_MODE", "stream").lower()
+TYPING_REFRESH_SECONDS = 4.0
 
 
 @telegram_router.post("/telegram/webhook")
 async def telegram_webhook(
     request: Request,
-    background_tasks: BackgroundTasks,
     pool: AsyncConnectionPool = Depends(get_db_pool),
 ):
     if TELEGRAM_WEBHOOK_SECRET:
@@ -28,17 +47,41 @@ async def telegram_webhook(
             raise HTTPException(status_code=403, detail="invalid secret token")
 
     data = await request.json()
-    background_tasks.add_task(process_telegram_update, data, pool)
+    # Telegram redelivers updates it thinks were slow; drop the repeats.
+    update_id = data.get("update_id")
+    if not await webhook_dedup.first_seen(pool, "telegram", update_id):
+        return {"status": "duplicate"}
+    # The LLM run happens in a worker process (see worker.py).
+    try:
+        await enqueue_job(pool, "telegram", data, _thread_keys(data))
+    except Exception:
+        await webhook_dedup.forget(pool, "telegram", update_id)
+        raise
     return {"status": "received"}
 
 
-async def process_telegram_update(data: dict, pool: AsyncConnectionPool):
-    message = (
+def _update_message(data: dict) -> dict | None:
+    return (
         data.get("message")
         or data.get("edited_message")
         or data.get("channel_post")
         or data.get("edited_channel_post")
     )
+
+
+def _thread_keys(data: dict) -> list[str]:
+    # The conversation thread the update's turn runs in, so workers run one
+    # job per chat at a time.
+    chat_id = ((_update_message(data) or {}).get("chat") or {}).get("id")
+    if chat_id is None:
+        return []
+    return [_build_thread_id(f"tg:{chat_id}", "telegram")]
+
+
+async def process_telegram_update(
+    data: dict, runtime: AgentRuntime, replies: JobReplies | None = None
+):
+    message = _update_message(data)
     if not message:
         return
 
@@ -54,11 +97,136 @@ async def process_telegram_update(data: dict, pool: AsyncConnectionPool):
     user_id = f"tg:{chat_id}"
 
     if len(text) > MAX_MESSAGE_LENGTH:
-        send_telegram_message(
-            chat_id=chat_id,
-            text="Your message is too long. Please try again with a shorter message.",
+        await telegram_outbound.enqueue(
+            chat_id,
+            "Your message is too long. Please try again with a shorter message.",
         )
         return
 
-    response = await run_agent(text, user_id, pool, channel="telegram")
-    send_telegram_message(chat_id=chat_id, text=response)
+    replies = replies or JobReplies()
+    reply_key = data.get("update_id", "update")
+    saved = replies.get(reply_key)
+    if saved is not None:
+        # The turn already ran; an earlier attempt failed to deliver it.
+        print(f"Re-sending saved Telegram reply for chat {chat_id}")
+        await _send_final_reply(chat_id, saved.get("message_id"), saved["text"])
+        return
+
+    # AgentBusyError propagates so the worker defers the job.
+    if TELEGRAM_DELIVERY_MODE == "stream":
+        await _deliver_streaming(text, user_id, chat_id, runtime, replies, reply_key)
+        return
+
+    response = await run_agent(text, user_id, runtime, channel="telegram")
+    if response:
+        await replies.save(reply_key, {"text": response})
+    await telegram_outbound.enqueue(chat_id, response)
+
+
+async def _keep_typing(chat_id, stop: asyncio.Event):
+    # Telegram clears the typing indicator after ~5s, so refresh it until
+    # the first tokens are on screen.
+    while not stop.is_set():
+        try:
+            await send_chat_action(chat_id, "typing")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Cosmetic only; never let it fail the reply.
+            print(f"Telegram typing indicator failed for chat {chat_id}: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=TYPING_REFRESH_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _deliver_streaming(
+    text: str,
+    user_id: str,
+    chat_id,
+    runtime: AgentRuntime,
+    replies: JobReplies,
+    reply_key,
+) -> None:
+    first_tokens = asyncio.Event()
+    typing_task = asyncio.create_task(_keep_typing(chat_id, first_tokens))
+
+    message_id = None
+    reply = ""
+    shown = ""
+    # Preview sends are best effort: a failure must not abort the run, or
+    # the retry would run the agent again. The final reply is sent below.
+    previewing = True
+    try:
+        async for chunk in stream_agent(text, user_id, runtime, channel="telegram"):
+            retracted = isinstance(chunk, StreamReset)
+            reply = chunk.text if retracted else reply + chunk
+            if not previewing:
+                continue
+            preview = reply.strip()[:TELEGRAM_MAX_MESSAGE_CHARS]
+            try:
+                if retracted and message_id is not None:
+                    # The message on screen shows text the model took back to
+                    # call a tool; replace it now rather than at the next
+                    # throttled edit.
+                    preview = preview or "…"
+                    if preview != shown:
+                        await edit_throttle.wait(chat_id)
+                        await telegram_outbound.acquire(chat_id)
+                        await edit_telegram_message(chat_id, message_id, preview, None)
+                        shown = preview
+                        edit_throttle.mark(chat_id)
+                    continue
+                if not preview or preview == shown:
+                    continue
+                # Partial replies go out as plain text: unfinished Markdown
+                # entities make Telegram reject the message.
+                if message_id is None:
+                    first_tokens.set()
+                    await telegram_outbound.acquire(chat_id)
+                    message_id = await send_telegram_message(chat_id, preview, None)
+                elif edit_throttle.ready(chat_id) and telegram_outbound.try_acquire(
+                    chat_id
+                ):
+                    await edit_telegram_message(chat_id, message_id, preview, None)
+                else:
+                    continue
+            except Exception as e:
+                print(f"Telegram preview failed for chat {chat_id}: {e}")
+                previewing = False
+                continue
+            shown = preview
+            edit_throttle.mark(chat_id)
+    finally:
+        first_tokens.set()
+        # Don't wait out a slow or rate-limited chat action.
+        typing_task.cancel()
+        try:
+            await typing_task
+        except asyncio.CancelledError:
+            pass
+
+    reply = reply.strip()
+    if not reply:
+        return
+    await replies.save(reply_key, {"text": reply, "message_id": message_id})
+    await _send_final_reply(chat_id, message_id, reply)
+
+
+async def _send_final_reply(chat_id, message_id: int | None, reply: str) -> None:
+    """Send the finished reply, completing the streamed message if there is one."""
+    if message_id is None:
+        await telegram_outbound.enqueue(chat_id, reply)
+        return
+
+    first = split_message(reply, TELEGRAM_MAX_MESSAGE_CHARS)[0]
+    # Final edit with Markdown formatting, falling back to plain text.
+    await edit_throttle.wait(chat_id)
+    await telegram_outbound.acquire(chat_id)
+    try:
+        await edit_telegram_message(chat_id, message_id, first)
+    except httpx.HTTPStatusError:
+        await edit_telegram_message(chat_id, message_id, first, None)
+    edit_throttle.mark(chat_id)
+    # Anything past Telegram's length limit follows as regular messages.
+    await telegram_outbound.enqueue(chat_id, reply[len(first) :])
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from api.services.websocket import manager
-from agent import run_agent
-from api.dependency import get_db_pool_ws
-from psycopg_pool import AsyncConnectionPool
+from agent import AgentRuntime, StreamReset, run_agent, stream_agent
+from api.dependency import get_runtime_ws
+from utils.admission import BUSY_MESSAGE, AgentBusyError
 import json
 import os
 
@@ -14,7 +14,7 @@ MAX_MESSAGE_LENGTH = int(os.getenv("MAX_MESSAGE_LENGTH", "1000"))
 async def websocket_endpoint(
     websocket: WebSocket,
     client_id: str,
-    pool: AsyncConnectionPool = Depends(get_db_pool_ws),
+    runtime: AgentRuntime = Depends(get_runtime_ws),
 ):
     await manager.connect(websocket)
     try:
@@ -23,9 +23,11 @@ async def websocket_endpoint(
             data = await websocket.receive_text()
 
             # Simple check if data is JSON
+            stream = False
             try:
                 message_data = json.loads(data)
                 user_message = message_data.get("text", data)
+                stream = bool(message_data.get("stream", False))
             except json.JSONDecodeError:
                 user_message = data
 
@@ -43,12 +45,12 @@ async def websocket_endpoint(
 
             # Use client_id as the unique identifier for the thread
             # and "websocket" as the channel
-            response = await run_agent(
-                user_message, client_id, pool, channel="websocket"
-            )
-            await manager.send_personal_message(
-                json.dumps({"type": "message", "text": response}), websocket
-            )
+            try:
+                await _reply(websocket, user_message, client_id, runtime, stream)
+            except AgentBusyError:
+                await manager.send_personal_message(
+                    json.dumps({"type": "error", "text": BUSY_MESSAGE}), websocket
+                )
 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
@@ -56,3 +58,31 @@ async def websocket_endpoint(
     except Exception as e:
         print(f"WebSocket error: {e}")
         manager.disconnect(websocket)
+
+
+async def _reply(
+    websocket: WebSocket,
+    user_message: str,
+    client_id: str,
+    runtime: AgentRuntime,
+    stream: bool,
+):
+    if stream:
+        async for chunk in stream_agent(
+            user_message, client_id, runtime, channel="websocket"
+        ):
+            if isinstance(chunk, StreamReset):
+                frame = {"type": "reset", "text": chunk.text}
+            else:
+                frame = {"type": "chunk", "text": chunk}
+            await manager.send_personal_message(json.dumps(frame), websocket)
+        await manager.send_personal_message(json.dumps({"type": "done"}), websocket)
+        return
+
+    response = await run_agent(user_message, client_id, runtime, channel="websocket")
+    if response is None:
+        # Merged into a turn answered on another connection.
+        return
+    await manager.send_personal_message(
+        json.dumps({"type": "message", "text": response}), websocket
+    )
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Request, HTTPException, Query, Depends
-from fastapi.background import BackgroundTasks
-from api.services.whatsapp import send_whatsapp_message
+from api.services.outbound import whatsapp_outbound
 from dotenv import load_dotenv
+import asyncio
 import os
-from agent import run_agent
+from agent import AgentRuntime, _build_thread_id, run_agent
 from api.dependency import get_db_pool
+from api.services.dedup import webhook_dedup
+from data.job_queue import JobReplies, PartialJobFailure, enqueue_job
+from utils.admission import AgentBusyError
 from psycopg_pool import AsyncConnectionPool
 
 load_dotenv()
@@ -12,29 +15,64 @@ load_dotenv()
 whatsapp_router = APIRouter()
 
 MAX_MESSAGE_LENGTH = int(os.getenv("MAX_MESSAGE_LENGTH", "1000"))
+# Senders from one batched webhook handled at the same time.
+WHATSAPP_FANOUT_CONCURRENCY = int(os.getenv("WHATSAPP_FANOUT_CONCURRENCY", "4"))
 
 
 @whatsapp_router.post("/webhook")
 async def whatsapp_webhook(
     request: Request,
-    background_tasks: BackgroundTasks,
     pool: AsyncConnectionPool = Depends(get_db_pool),
 ):
     data = await request.json()
-    background_tasks.add_task(process_whatsapp_message, data, pool)
+    messages = _extract_messages(data)
+    if not messages:
+        # Status callbacks and other events carry no user message.
+        return {"status": "ignored"}
+    # Meta redelivers events; drop messages we've already accepted.
+    fresh_ids = await webhook_dedup.first_seen_many(
+        pool, "whatsapp", [message.get("id") for message in messages]
+    )
+    fresh = []
+    for message in messages:
+        message_id = message.get("id")
+        if message_id is None:
+            fresh.append(message)
+        elif str(message_id) in fresh_ids:
+            fresh_ids.discard(str(message_id))  # once per batch
+            fresh.append(message)
+    if not fresh:
+        return {"status": "duplicate"}
+    # The LLM run happens in a worker process (see worker.py).
+    try:
+        await enqueue_job(pool, "whatsapp", {"messages": fresh}, _thread_keys(fresh))
+    except Exception:
+        for message in fresh:
+            await webhook_dedup.forget(pool, "whatsapp", message.get("id"))
+        raise
     return {"status": "recieved"}
 
 
-async def process_whatsapp_message(data: dict, pool: AsyncConnectionPool):
-    entry = data.get("entry", [{}])[0]
-    changes = entry.get("changes", [{}])[0]
-    value = changes.get("value", {})
-    if "messages" not in value:
-        return
-    messages = value["messages"]
-    if not messages:
-        return
-    message = messages[0]
+def _extract_messages(data: dict) -> list[dict]:
+    # Jobs carry the already flattened {"messages": [...]} form.
+    if "entry" not in data:
+        return list(data.get("messages") or [])
+    # Meta batches several entries, changes and messages into one POST.
+    messages: list[dict] = []
+    for entry in data.get("entry") or []:
+        for change in entry.get("changes") or []:
+            value = change.get("value") or {}
+            messages.extend(value.get("messages") or [])
+    return messages
+
+
+def _thread_keys(messages: list[dict]) -> list[str]:
+    # The conversation threads the messages' turns run in, so workers run
+    # one job per sender at a time.
+    return [_build_thread_id(m["from"], "whatsapp") for m in messages if m.get("from")]
+
+
+async def _handle_message(message: dict, runtime: AgentRuntime, replies: JobReplies):
     from_number = message["from"]
     text_block = message.get("text") or {}
     user_text = text_block.get("body")
@@ -43,15 +81,76 @@ async def process_whatsapp_message(data: dict, pool: AsyncConnectionPool):
     print(f"User text: {user_text}")
 
     if len(user_text) > MAX_MESSAGE_LENGTH:
-        send_whatsapp_message(
-            to=from_number,
-            body=f"Your message is too long. Please try again with a shorter message.",
+        await whatsapp_outbound.enqueue(
+            from_number,
+            "Your message is too long. Please try again with a shorter message.",
         )
-        return {"status": "message too long"}
+        return
+
+    message_id = message.get("id")
+    saved = replies.get(message_id) if message_id else None
+    if saved is not None:
+        # The turn already ran; an earlier attempt failed to deliver it.
+        print(f"Re-sending saved WhatsApp reply to message {message_id}")
+        await whatsapp_outbound.enqueue(from_number, saved["text"])
+        return
 
-    response = await run_agent(user_text, from_number, pool)
+    response = await run_agent(user_text, from_number, runtime)
+    if response and message_id:
+        await replies.save(message_id, {"text": response})
+    await whatsapp_outbound.enqueue(from_number, response)
 
-    send_whatsapp_message(to=from_number, body=response)
+
+async def process_whatsapp_message(
+    data: dict, runtime: AgentRuntime, replies: JobReplies | None = None
+):
+    messages = [m for m in _extract_messages(data) if m.get("from")]
+    if not messages:
+        return
+    replies = replies or JobReplies()
+
+    # Same sender: in order. Different senders: concurrently, bounded.
+    by_sender: dict[str, list[dict]] = {}
+    for message in messages:
+        by_sender.setdefault(message["from"], []).append(message)
+
+    semaphore = asyncio.Semaphore(WHATSAPP_FANOUT_CONCURRENCY)
+    errors: list[Exception] = []
+    failed: list[dict] = []
+    busy: list[dict] = []
+
+    async def handle_sender(sender_messages: list[dict]):
+        async with semaphore:
+            for i, message in enumerate(sender_messages):
+                try:
+                    await _handle_message(message, runtime, replies)
+                except AgentBusyError:
+                    # Keep this sender's remaining messages together, in order.
+                    busy.extend(sender_messages[i:])
+                    return
+                except Exception as e:
+                    print(f"Error handling WhatsApp message {message.get('id')}: {e}")
+                    errors.append(e)
+                    # Retry the rest with it so the sender's replies stay in order.
+                    failed.extend(sender_messages[i:])
+                    return
+
+    await asyncio.gather(*(handle_sender(group) for group in by_sender.values()))
+
+    if len(failed) + len(busy) == len(messages):
+        # Nothing was answered: retry (or defer) the whole job.
+        if errors:
+            raise errors[0]
+        raise AgentBusyError("all messages rejected")
+    if busy:
+        # Queue just the messages that were turned away, not the answered ones.
+        await enqueue_job(
+            runtime.pool, "whatsapp", {"messages": busy}, _thread_keys(busy)
+        )
+    if failed:
+        # Retry just the failed messages; the job's attempts keep counting,
+        # so a message that keeps failing ends up in "failed".
+        raise PartialJobFailure({"messages": failed}, errors[0])
 
 
 @whatsapp_router.get("/webhook")
@@ -1,14 +1,104 @@
 from typing_extensions import TypedDict
-from typing import Annotated, List
+from typing import Annotated, Dict, List
 from pydantic import BaseModel
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
 
+class TurnIndex(TypedDict):
+    counts: List[int]  # messages per turn, oldest first
+    tokens: List[int]  # estimated prompt tokens per turn
+    indexed: int  # leading messages covered by the index
+    total_tokens: int
+    compacted: int  # leading turns whose tool results were already stubbed
+
+
+def empty_turn_index() -> TurnIndex:
+    return {
+        "counts": [],
+        "tokens": [],
+        "indexed": 0,
+        "total_tokens": 0,
+        "compacted": 0,
+    }
+
+
+def _apply_turn_op(index: TurnIndex, op: dict) -> TurnIndex:
+    kind = op.get("op")
+    if kind == "reset":
+        return op.get("index") or empty_turn_index()
+
+    counts = list(index["counts"])
+    tokens = list(index["tokens"])
+    indexed = index["indexed"]
+    total = index["total_tokens"]
+    # Missing in checkpoints written before the watermark existed.
+    compacted = index.get("compacted", 0)
+
+    if kind == "extend":
+        # Entries are (starts_turn, tokens) for messages from position
+        # op["start"] on; ones the index already covers are skipped.
+        entries = op.get("entries") or []
+        for starts_turn, message_tokens in entries[max(0, indexed - op["start"]) :]:
+            if starts_turn or not counts:
+                counts.append(0)
+                tokens.append(0)
+            counts[-1] += 1
+            tokens[-1] += message_tokens
+            indexed += 1
+            total += message_tokens
+    elif kind == "drop":
+        # The oldest op["turns"] turns were removed from messages.
+        dropped = op.get("turns", 0)
+        indexed -= sum(counts[:dropped])
+        total -= sum(tokens[:dropped])
+        compacted = max(0, compacted - dropped)
+        del counts[:dropped]
+        del tokens[:dropped]
+    elif kind == "adjust":
+        # Messages in turn op["turn"] were rewritten to a different size.
+        tokens[op["turn"]] += op["tokens"]
+        total += op["tokens"]
+    elif kind == "compacted":
+        # Tool results in the oldest op["turns"] turns have been stubbed.
+        compacted = max(compacted, op.get("turns", 0))
+
+    return {
+        "counts": counts,
+        "tokens": tokens,
+        "indexed": indexed,
+        "total_tokens": total,
+        "compacted": compacted,
+    }
+
+
+def update_turn_index(current: TurnIndex | None, update) -> TurnIndex:
+    """
+    Reducer for ChatbotState.turn_index. Takes one op dict or a list of them
+    so callers can catch the index up and drop turns in one state update.
+    """
+    index = current or empty_turn_index()
+    for op in update if isinstance(update, list) else [update]:
+        if op:
+            index = _apply_turn_op(index, op)
+    return index
+
+
+class PrefetchedEntities(TypedDict):
+    products: Dict[str, List[dict]]  # normalized title -> product detail rows
+    reviews: Dict[str, List[dict]]  # product id (as str) -> review rows
+
+
 class ChatbotState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
     summary: str | None
     retrieved_tools: List[str]
+    # Turn boundaries and sizes, maintained alongside messages so budget
+    # checks don't walk the whole history.
+    turn_index: Annotated[TurnIndex, update_turn_index]
+    # Catalog rows the tool router already looked up this turn; tools reuse
+    # them instead of querying again. Cleared once the reply is sent.
+    prefetched: PrefetchedEntities | None
 
 
 class ErrorResponse(BaseModel):
@@ -53,6 +143,17 @@ class ProductDetails(BaseModel):
     items: list[ProductDetailItem]
 
 
+class ProductMatchItem(ProductDetailItem):
+    requested_name: str | None = None
+    exact_title_match: bool | None = None
+
+
+class ProductBatchDetails(BaseModel):
+    type: str = "product_batch"
+    items: list[ProductMatchItem]
+    not_found: list[str] = []
+
+
 class ReviewItem(BaseModel):
     comment: str | None = None
 
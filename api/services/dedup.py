@@ -0,0 +1,145 @@
+import os
+from collections import OrderedDict
+from dotenv import load_dotenv
+from psycopg_pool import AsyncConnectionPool
+
+from utils import metrics
+
+load_dotenv()
+
+WEBHOOK_DEDUP_CACHE_SIZE = int(os.getenv("WEBHOOK_DEDUP_CACHE_SIZE", "10000"))
+WEBHOOK_DEDUP_RETENTION_HOURS = float(os.getenv("WEBHOOK_DEDUP_RETENTION_HOURS", "48"))
+# Prune expired keys after this many newly recorded ones.
+_PRUNE_EVERY = 1000
+
+WEBHOOK_DEDUP_DDL = """
+create table if not exists processed_webhooks (
+    platform text not null,
+    message_id text not null,
+    received_at timestamptz not null default now(),
+    primary key (platform, message_id)
+);
+create index if not exists processed_webhooks_received_at_idx
+    on processed_webhooks (received_at);
+"""
+
+RECORD_WEBHOOKS_SQL = """
+insert into processed_webhooks (platform, message_id)
+select %(platform)s, message_id
+from unnest(%(message_ids)s::text[]) as ids(message_id)
+on conflict do nothing
+returning message_id
+"""
+
+FORGET_WEBHOOK_SQL = """
+delete from processed_webhooks
+where platform = %(platform)s and message_id = %(message_id)s
+"""
+
+PRUNE_WEBHOOKS_SQL = """
+delete from processed_webhooks
+where received_at < now() - %(hours)s * interval '1 hour'
+"""
+
+
+class WebhookDeduplicator:
+    """
+    Drops webhook deliveries whose platform message ID was already seen.
+
+    A bounded in-process LRU answers repeats without a round trip; the
+    processed_webhooks table's primary key makes the check hold across API
+    workers and restarts.
+    """
+
+    def __init__(self, capacity: int = WEBHOOK_DEDUP_CACHE_SIZE):
+        self.capacity = capacity
+        self._seen: OrderedDict[tuple[str, str], None] = OrderedDict()
+        self._recorded = 0
+
+    def _remember(self, key: tuple[str, str]) -> None:
+        self._seen[key] = None
+        self._seen.move_to_end(key)
+        while len(self._seen) > self.capacity:
+            self._seen.popitem(last=False)
+
+    async def first_seen(
+        self, pool: AsyncConnectionPool, platform: str, message_id
+    ) -> bool:
+        """Record the ID and return False if it was already processed."""
+        if message_id is None:
+            return True
+        return str(message_id) in await self.first_seen_many(
+            pool, platform, [message_id]
+        )
+
+    async def first_seen_many(
+        self, pool: AsyncConnectionPool, platform: str, message_ids
+    ) -> set[str]:
+        """
+        Record the IDs in one round trip and return the ones (as strings) not
+        processed before.
+        """
+        unknown: list[str] = []
+        for message_id in dict.fromkeys(str(m) for m in message_ids if m is not None):
+            key = (platform, message_id)
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                metrics.increment(f"webhook_{platform}_duplicates")
+            else:
+                unknown.append(message_id)
+        if not unknown:
+            return set()
+
+        try:
+            async with pool.connection() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(
+                        RECORD_WEBHOOKS_SQL,
+                        {"platform": platform, "message_ids": unknown},
+                    )
+                    fresh = {row["message_id"] for row in await cur.fetchall()}
+        except Exception as e:
+            # Fail open: a missed duplicate is better than a dropped message.
+            print(f"Webhook dedup check failed: {e}")
+            return set(unknown)
+
+        for message_id in unknown:
+            self._remember((platform, message_id))
+            if message_id not in fresh:
+                metrics.increment(f"webhook_{platform}_duplicates")
+
+        recorded = self._recorded
+        self._recorded += len(fresh)
+        if self._recorded // _PRUNE_EVERY > recorded // _PRUNE_EVERY:
+            await prune_webhook_dedup(pool)
+        return fresh
+
+    async def forget(self, pool: AsyncConnectionPool, platform: str, message_id) -> None:
+        """Undo first_seen when accepting the delivery failed, so a retry runs."""
+        if message_id is None:
+            return
+        key = (platform, str(message_id))
+        self._seen.pop(key, None)
+        async with pool.connection() as conn:
+            await conn.execute(
+                FORGET_WEBHOOK_SQL, {"platform": platform, "message_id": key[1]}
+            )
+
+
+async def setup_webhook_dedup(pool: AsyncConnectionPool) -> None:
+    async with pool.connection() as conn:
+        await conn.execute(WEBHOOK_DEDUP_DDL)
+    await prune_webhook_dedup(pool)
+
+
+async def prune_webhook_dedup(pool: AsyncConnectionPool) -> None:
+    try:
+        async with pool.connection() as conn:
+            await conn.execute(
+                PRUNE_WEBHOOKS_SQL, {"hours": WEBHOOK_DEDUP_RETENTION_HOURS}
+            )
+    except Exception as e:
+        print(f"Webhook dedup prune failed: {e}")
+
+
+webhook_dedup = WebhookDeduplicator()
@@ -0,0 +1,117 @@
+import os
+import asyncio
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OUTBOUND_TIMEOUT = float(os.getenv("OUTBOUND_TIMEOUT", "10"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+OUTBOUND_BACKOFF = float(os.getenv("OUTBOUND_BACKOFF", "0.5"))
+# Never sleep longer than this on a single retry, whatever the API asks for.
+OUTBOUND_MAX_RETRY_DELAY = float(os.getenv("OUTBOUND_MAX_RETRY_DELAY", "30"))
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    header = response.headers.get("Retry-After")
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+    # Telegram reports flood-control waits in the JSON body.
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    if isinstance(body, dict):
+        retry_after = (body.get("parameters") or {}).get("retry_after")
+        if isinstance(retry_after, (int, float)):
+            return float(retry_after)
+    return None
+
+
+# Failures where the request never reached the server, so a retry can't
+# deliver a message twice. A read timeout or a dropped response may come
+# after the platform already accepted the message.
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _should_retry(response: httpx.Response) -> bool:
+    return response.status_code == 429 or response.status_code >= 500
+
+
+class OutboundClient:
+    """
+    Shared keep-alive HTTP client for outbound platform API calls, with
+    per-request timeouts and retries with backoff on 429/5xx responses.
+
+    Other transport errors are only retried for idempotent calls; sends
+    and edits are retried only when the request provably wasn't sent.
+    """
+
+    def __init__(
+        self,
+        timeout: float = OUTBOUND_TIMEOUT,
+        max_retries: int = OUTBOUND_MAX_RETRIES,
+        backoff: float = OUTBOUND_BACKOFF,
+    ):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def post_json(
+        self,
+        url: str,
+        payload: dict,
+        headers: dict | None = None,
+        timeout: float | None = None,
+        idempotent: bool = False,
+    ) -> httpx.Response:
+        kwargs = {"json": payload, "headers": headers}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+
+        attempt = 0
+        while True:
+            delay = self.backoff * (2**attempt)
+            try:
+                response = await self._client.post(url, **kwargs)
+            except httpx.TransportError as e:
+                retryable = idempotent or isinstance(e, _NOT_SENT_ERRORS)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+            else:
+                if not _should_retry(response) or attempt >= self.max_retries:
+                    return response
+                retry_after = _retry_after(response)
+                if retry_after is not None:
+                    delay = retry_after
+                print(
+                    f"Outbound request got {response.status_code}, "
+                    f"retrying in {delay:.1f}s"
+                )
+            attempt += 1
+            await asyncio.sleep(min(delay, OUTBOUND_MAX_RETRY_DELAY))
+
+
+_client: OutboundClient | None = None
+
+
+def set_http_client(client: OutboundClient | None) -> None:
+    global _client
+    _client = client
+
+
+def get_http_client() -> OutboundClient:
+    """Return the process-wide client, creating one outside the app lifespan."""
+    global _client
+    if _client is None:
+        _client = OutboundClient()
+    return _client
@@ -0,0 +1,330 @@
+import os
+import time
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import httpx
+from dotenv import load_dotenv
+
+from api.services.telegram import TELEGRAM_MAX_MESSAGE_CHARS, send_telegram_message
+from api.services.whatsapp import WHATSAPP_MAX_MESSAGE_CHARS, send_whatsapp_message
+from utils import metrics
+
+load_dotenv()
+
+# Telegram allows ~30 messages/s per bot and ~1 message/s per chat.
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = float(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+# WhatsApp Cloud API throughput tier (messages/s) and per-recipient pacing.
+WHATSAPP_GLOBAL_RATE = float(os.getenv("WHATSAPP_GLOBAL_RATE", "80"))
+WHATSAPP_CHAT_RATE = float(os.getenv("WHATSAPP_CHAT_RATE", "1"))
+WHATSAPP_CHAT_BURST = float(os.getenv("WHATSAPP_CHAT_BURST", "5"))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available (0 if available now)."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self) -> None:
+        self.tokens -= 1
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+def split_message(text: str, limit: int) -> list[str]:
+    """
+    Split text into chunks of at most `limit` characters, preferring paragraph,
+    line and word boundaries. Each chunk is a prefix of the remaining text.
+    """
+    parts: list[str] = []
+    remaining = text.strip()
+    while len(remaining) > limit:
+        window = remaining[:limit]
+        cut = -1
+        for separator in ("\n\n", "\n", " "):
+            cut = window.rfind(separator)
+            if cut > limit // 2:
+                break
+        if cut <= 0:
+            cut = limit
+        parts.append(remaining[:cut].rstrip())
+        remaining = remaining[cut:].lstrip()
+    if remaining:
+        parts.append(remaining)
+    return parts
+
+
+def _mark_retrieved(future: asyncio.Future) -> None:
+    # Failures are logged by the scheduler, and callers needn't await them.
+    if not future.cancelled():
+        future.exception()
+
+
+class _Delivery:
+    """Tracks one enqueue() call, which may be split into several sends."""
+
+    def __init__(self, parts: int):
+        self.remaining = parts
+        self.future = asyncio.get_running_loop().create_future()
+        self.future.add_done_callback(_mark_retrieved)
+
+    def sent(self) -> None:
+        self.remaining -= 1
+        if self.remaining <= 0 and not self.future.done():
+            self.future.set_result(None)
+
+    def failed(self, error: Exception) -> None:
+        if not self.future.done():
+            self.future.set_exception(error)
+
+
+@dataclass
+class _Pending:
+    text: str
+    enqueued_at: float
+    deliveries: list[_Delivery] = field(default_factory=list)
+
+
+class OutboundScheduler:
+    """
+    Queues outbound messages per platform and sends them under a global token
+    bucket plus one bucket per chat. Messages waiting for the same chat are
+    merged when they fit, and long replies are split to the platform limit.
+    Each chat has at most one send in flight so its messages stay in order.
+    """
+
+    def __init__(
+        self,
+        platform: str,
+        send: Callable[[str, str], Awaitable],
+        max_chars: int,
+        global_rate: float,
+        chat_rate: float,
+        chat_burst: float,
+    ):
+        self.platform = platform
+        self.max_chars = max_chars
+        self._send = send
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chat_buckets: dict[str, TokenBucket] = {}
+        self._queues: dict[str, deque[_Pending]] = {}
+        self._ready: deque[str] = deque()
+        self._inflight: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._worker: asyncio.Task | None = None
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                # Buckets that have fully refilled carry no state worth keeping.
+                self._chat_buckets = {
+                    k: v for k, v in self._chat_buckets.items() if not v.is_full()
+                }
+            bucket = TokenBucket(self._chat_rate, self._chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _update_depth(self) -> None:
+        metrics.set_gauge(f"outbound_{self.platform}_queue_depth", self.queue_depth())
+
+    def enqueue(self, chat_id, text: str) -> asyncio.Future:
+        """
+        Queue a message for delivery and return immediately. The returned
+        future resolves once every part has been sent, or fails with the
+        send error.
+        """
+        text = (text or "").strip()
+        if not text:
+            delivery = _Delivery(0)
+            delivery.sent()
+            return delivery.future
+        chat_id = str(chat_id)
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = deque()
+            self._queues[chat_id] = queue
+            self._ready.append(chat_id)
+
+        if queue and len(queue[-1].text) + 2 + len(text) <= self.max_chars:
+            # Burst for a chat that is still waiting: send one message.
+            delivery = _Delivery(1)
+            queue[-1].text += "\n\n" + text
+            queue[-1].deliveries.append(delivery)
+            metrics.increment(f"outbound_{self.platform}_merged")
+        else:
+            parts = split_message(text, self.max_chars)
+            if len(parts) > 1:
+                metrics.increment(f"outbound_{self.platform}_split")
+            delivery = _Delivery(len(parts))
+            now = time.monotonic()
+            queue.extend(_Pending(part, now, [delivery]) for part in parts)
+
+        self._update_depth()
+        self._ensure_started()
+        self._wakeup.set()
+        return delivery.future
+
+    def try_acquire(self, chat_id) -> bool:
+        """Take a send slot for a direct API call if one is free right now."""
+        bucket = self._chat_bucket(str(chat_id))
+        if self._global.wait_time() > 0 or bucket.wait_time() > 0:
+            return False
+        self._global.consume()
+        bucket.consume()
+        return True
+
+    async def acquire(self, chat_id) -> None:
+        """Wait for a send slot for a direct API call (e.g. message edits)."""
+        bucket = self._chat_bucket(str(chat_id))
+        while True:
+            wait = max(self._global.wait_time(), bucket.wait_time())
+            if wait <= 0:
+                self._global.consume()
+                bucket.consume()
+                return
+            await asyncio.sleep(wait)
+
+    def _ensure_started(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Give queued messages a chance to go out, then stop the worker."""
+        deadline = time.monotonic() + timeout
+        while (self._queues or self._tasks) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def _next_chat(self) -> tuple[str | None, float | None]:
+        """Pick the next sendable chat round-robin, or how long to wait."""
+        min_wait = None
+        for _ in range(len(self._ready)):
+            chat_id = self._ready[0]
+            self._ready.rotate(-1)
+            if chat_id in self._inflight:
+                continue
+            wait = self._chat_bucket(chat_id).wait_time()
+            if wait <= 0:
+                return chat_id, None
+            min_wait = wait if min_wait is None else min(min_wait, wait)
+        return None, min_wait
+
+    async def _run(self) -> None:
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            global_wait = self._global.wait_time()
+            if global_wait > 0:
+                await asyncio.sleep(global_wait)
+                continue
+
+            chat_id, wait = self._next_chat()
+            if chat_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._global.consume()
+            self._chat_bucket(chat_id).consume()
+            queue = self._queues[chat_id]
+            pending = queue.popleft()
+            if not queue:
+                del self._queues[chat_id]
+                self._ready.remove(chat_id)
+            self._update_depth()
+            metrics.observe(
+                f"outbound_{self.platform}_queue_wait_seconds",
+                time.monotonic() - pending.enqueued_at,
+            )
+
+            self._inflight.add(chat_id)
+            task = asyncio.create_task(self._deliver(chat_id, pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _deliver(self, chat_id: str, pending: _Pending) -> None:
+        try:
+            await self._send(chat_id, pending.text)
+            metrics.increment(f"outbound_{self.platform}_sent")
+            for delivery in pending.deliveries:
+                delivery.sent()
+        except Exception as e:
+            metrics.increment(f"outbound_{self.platform}_failed")
+            print(f"Error delivering {self.platform} message to {chat_id}: {e}")
+            for delivery in pending.deliveries:
+                delivery.failed(e)
+        finally:
+            self._inflight.discard(chat_id)
+            self._wakeup.set()
+
+
+async def _send_telegram(chat_id: str, text: str) -> None:
+    try:
+        await send_telegram_message(chat_id, text)
+    except httpx.HTTPStatusError as e:
+        # A split or merged reply can leave Markdown entities unbalanced.
+        if e.response.status_code != 400:
+            raise
+        await send_telegram_message(chat_id, text, parse_mode=None)
+
+
+async def _send_whatsapp(chat_id: str, text: str) -> None:
+    await send_whatsapp_message(to=chat_id, body=text)
+
+
+telegram_outbound = OutboundScheduler(
+    "telegram",
+    _send_telegram,
+    max_chars=TELEGRAM_MAX_MESSAGE_CHARS,
+    global_rate=TELEGRAM_GLOBAL_RATE,
+    chat_rate=TELEGRAM_CHAT_RATE,
+    chat_burst=TELEGRAM_CHAT_BURST,
+)
+
+whatsapp_outbound = OutboundScheduler(
+    "whatsapp",
+    _send_whatsapp,
+    max_chars=WHATSAPP_MAX_MESSAGE_CHARS,
+    global_rate=WHATSAPP_GLOBAL_RATE,
+    chat_rate=WHATSAPP_CHAT_RATE,
+    chat_burst=WHATSAPP_CHAT_BURST,
+)
@@ -1,11 +1,16 @@
 import os
 import re
-import requests
+import time
+import asyncio
 from dotenv import load_dotenv
+from api.services.http_client import get_http_client
 
 load_dotenv()
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_MAX_MESSAGE_CHARS = 4096
+# Minimum seconds between edits of messages in the same chat.
+TELEGRAM_EDIT_INTERVAL = float(os.getenv("TELEGRAM_EDIT_INTERVAL", "1.5"))
 
 
 _BULLET_RE = re.compile(r"^(?P<indent>\s*)[\*\-]\s+")
@@ -20,16 +25,19 @@ def _format_telegram_text(text: str) -> str:
     return "\n".join(formatted)
 
 
-def send_telegram_message(
-    chat_id: str, text: str, parse_mode: str | None = "Markdown"
-) -> None:
-    """
-    Sends a text message via the Telegram Bot API.
-    """
+def _api_url(method: str) -> str:
     if not TELEGRAM_BOT_TOKEN:
         raise RuntimeError("TELEGRAM_BOT_TOKEN is not set")
+    return f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/{method}"
+
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+async def send_telegram_message(
+    chat_id: str, text: str, parse_mode: str | None = "Markdown"
+) -> int | None:
+    """
+    Sends a text message via the Telegram Bot API and returns its message_id.
+    """
+    url = _api_url("sendMessage")
     payload = {
         "chat_id": chat_id,
         "text": _format_telegram_text(text),
@@ -38,7 +46,78 @@ def send_telegram_message(
     if parse_mode:
         payload["parse_mode"] = parse_mode
 
-    response = requests.post(url, json=payload, timeout=10)
+    response = await get_http_client().post_json(url, payload)
     if response.status_code != 200:
         print("Error sending Telegram message:", response.text)
         response.raise_for_status()
+    return response.json().get("result", {}).get("message_id")
+
+
+async def edit_telegram_message(
+    chat_id: str, message_id: int, text: str, parse_mode: str | None = "Markdown"
+) -> None:
+    """
+    Replaces the text of a message previously sent by the bot.
+    """
+    url = _api_url("editMessageText")
+    payload = {
+        "chat_id": chat_id,
+        "message_id": message_id,
+        "text": _format_telegram_text(text),
+        "disable_web_page_preview": True,
+    }
+    if parse_mode:
+        payload["parse_mode"] = parse_mode
+
+    response = await get_http_client().post_json(url, payload)
+    if response.status_code != 200:
+        # Re-sending identical text is rejected but harmless.
+        if "message is not modified" in response.text:
+            return
+        print("Error editing Telegram message:", response.text)
+        response.raise_for_status()
+
+
+async def send_chat_action(chat_id: str, action: str = "typing") -> None:
+    """
+    Shows a chat action such as "typing" (Telegram clears it after ~5s).
+    """
+    url = _api_url("sendChatAction")
+    response = await get_http_client().post_json(
+        url, {"chat_id": chat_id, "action": action}, idempotent=True
+    )
+    if response.status_code != 200:
+        print("Error sending Telegram chat action:", response.text)
+
+
+class EditThrottle:
+    """
+    Spaces out message edits per chat to stay under Telegram's rate limits.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._last_edit: dict[str, float] = {}
+
+    def ready(self, chat_id: str) -> bool:
+        last = self._last_edit.get(str(chat_id))
+        return last is None or time.monotonic() - last >= self.interval
+
+    async def wait(self, chat_id: str) -> None:
+        last = self._last_edit.get(str(chat_id))
+        if last is not None:
+            remaining = self.interval - (time.monotonic() - last)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+
+    def mark(self, chat_id: str) -> None:
+        now = time.monotonic()
+        if len(self._last_edit) > 10000:
+            # Forget chats whose interval has long passed.
+            self._last_edit = {
+                k: v for k, v in self._last_edit.items() if now - v < self.interval
+            }
+        self._last_edit[str(chat_id)] = now
+
+
+edit_throttle = EditThrottle(TELEGRAM_EDIT_INTERVAL)
@@ -1,14 +1,16 @@
 import os
-import requests
 from dotenv import load_dotenv
+from api.services.http_client import get_http_client
 
 load_dotenv()
 
 WHATSAPP_API_TOKEN = os.getenv("WHATSAPP_API_TOKEN")
 PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
+# Maximum length of a text message body in the Cloud API.
+WHATSAPP_MAX_MESSAGE_CHARS = 4096
 
 
-def send_whatsapp_message(to: str, body: str):
+async def send_whatsapp_message(to: str, body: str):
     """
     Calls the WhatsApp Cloud API to send a text message.
     """
@@ -25,7 +27,7 @@ def send_whatsapp_message(to: str, body: str):
         "text": {"preview_url": False, "body": body},
     }
 
-    response = requests.post(url, headers=headers, json=payload)
+    response = await get_http_client().post_json(url, payload, headers=headers)
 
     if response.status_code != 200:
         # Handle errors, log them, etc.
@@ -0,0 +1,240 @@
+import os
+import time
+import asyncio
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+
+from psycopg import sql
+from psycopg_pool import AsyncConnectionPool
+
+from data.db import (
+    GET_PRODUCT_BY_ID_SQL,
+    GET_PRODUCT_REVIEWS_SQL,
+    GET_PRODUCTS_BY_CATEGORY_SQL,
+    LIST_TAG_CATEGORIES_SQL,
+    hybrid_search_params,
+    products_by_names_params,
+    products_by_names_query,
+    products_by_title_query,
+    search_products_hybrid_query,
+)
+from data.catalog_snapshot import (
+    CatalogSnapshot,
+    load_catalog_products,
+    load_catalog_snapshot,
+)
+from data.db_pool import create_async_pool
+from data.entity_matcher import EntityMatch
+from utils import metrics
+
+load_dotenv()
+
+# Serve title/category/review lookups from an in-memory copy of the catalog.
+CATALOG_SNAPSHOT_ENABLED = os.getenv("CATALOG_SNAPSHOT_ENABLED", "1") == "1"
+# Seconds between background snapshot reloads; 0 disables periodic reloads.
+CATALOG_SNAPSHOT_REFRESH_SECONDS = float(
+    os.getenv("CATALOG_SNAPSHOT_REFRESH_SECONDS", "300")
+)
+# Above this many changed products a full reload is cheaper than patching.
+_PARTIAL_REFRESH_MAX_IDS = 100
+
+
+class CatalogRepository:
+    """
+    Async product catalog queries backed by an AsyncConnectionPool.
+
+    Pass the application's pool to share it; without one, a dedicated pool is
+    opened lazily on first use (handy for the CLI, scripts and tests).
+
+    Once refresh_snapshot() has loaded a CatalogSnapshot, exact title,
+    category, id and review lookups are answered from memory; ranked
+    searches still go to Postgres.
+    """
+
+    def __init__(self, pool: AsyncConnectionPool | None = None):
+        self._pool = pool
+        self._owns_pool = pool is None
+        self._open_lock = asyncio.Lock()
+        self._snapshot: CatalogSnapshot | None = None
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+
+    async def _get_pool(self) -> AsyncConnectionPool:
+        if self._pool is None:
+            async with self._open_lock:
+                if self._pool is None:
+                    pool = create_async_pool()
+                    await pool.open()
+                    self._pool = pool
+        return self._pool
+
+    @property
+    def snapshot(self) -> CatalogSnapshot | None:
+        return self._snapshot
+
+    async def refresh_snapshot(self) -> CatalogSnapshot | None:
+        """Reload the whole catalog and swap it in (on demand or on a timer)."""
+        async with self._refresh_lock:
+            started = time.perf_counter()
+            pool = await self._get_pool()
+            try:
+                async with pool.connection() as conn:
+                    snapshot = await load_catalog_snapshot(conn)
+            except Exception as e:
+                # Keep serving the previous snapshot (or Postgres) on failure.
+                metrics.increment("catalog_snapshot_refresh_failed")
+                print(f"Catalog snapshot refresh failed: {e}")
+                return self._snapshot
+            self._snapshot = snapshot
+            elapsed = time.perf_counter() - started
+            metrics.observe("catalog_snapshot_refresh_seconds", elapsed)
+            metrics.set_gauge("catalog_snapshot_products", len(snapshot.products_by_id))
+            print(
+                f"Catalog snapshot loaded: {len(snapshot.products_by_id)} products "
+                f"in {elapsed:.3f}s"
+            )
+            return snapshot
+
+    async def refresh_products(self, product_ids: set[int]) -> None:
+        """Reload only the given products (e.g. after a catalog change notification)."""
+        if self._snapshot is None or not product_ids:
+            return
+        if len(product_ids) > _PARTIAL_REFRESH_MAX_IDS:
+            await self.refresh_snapshot()
+            return
+        async with self._refresh_lock:
+            pool = await self._get_pool()
+            try:
+                async with pool.connection() as conn:
+                    products, reviews = await load_catalog_products(conn, list(product_ids))
+            except Exception as e:
+                metrics.increment("catalog_snapshot_refresh_failed")
+                print(f"Catalog refresh for products {sorted(product_ids)} failed: {e}")
+                return
+            self._snapshot = self._snapshot.with_products(product_ids, products, reviews)
+            metrics.increment("catalog_products_refreshed", len(product_ids))
+            metrics.set_gauge(
+                "catalog_snapshot_products", len(self._snapshot.products_by_id)
+            )
+
+    async def _refresh_periodically(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.refresh_snapshot()
+
+    async def start_snapshot(
+        self, interval: float = CATALOG_SNAPSHOT_REFRESH_SECONDS
+    ) -> None:
+        """Load the snapshot and keep it fresh in the background."""
+        if not CATALOG_SNAPSHOT_ENABLED:
+            return
+        await self.refresh_snapshot()
+        if interval > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_periodically(interval))
+
+    async def stop_snapshot(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def close(self) -> None:
+        await self.stop_snapshot()
+        if self._owns_pool and self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def _fetchall(
+        self, query: str | sql.Composable, params: Dict[str, Any] | None = None
+    ) -> List[Dict[str, Any]]:
+        pool = await self._get_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query, params)
+                return await cur.fetchall()
+
+    async def search_products_hybrid(
+        self, query: str, limit: int = 5, fields: List[str] | None = None
+    ) -> List[Dict[str, Any]]:
+        params = hybrid_search_params(query, limit)
+        if params is None:
+            return []
+        return await self._fetchall(search_products_hybrid_query(fields), params)
+
+    async def get_product_by_id(self, product_id: int) -> Dict[str, Any] | None:
+        if self._snapshot is not None:
+            return self._snapshot.get_product_by_id(product_id)
+        rows = await self._fetchall(GET_PRODUCT_BY_ID_SQL, {"id": product_id})
+        return rows[0] if rows else None
+
+    async def get_products_by_title(
+        self, title: str, limit: int = 5, fields: List[str] | None = None
+    ) -> List[Dict[str, Any]]:
+        if self._snapshot is not None:
+            return self._snapshot.get_products_by_title(title, limit, fields)
+        return await self._fetchall(
+            products_by_title_query(fields), {"title": title, "limit": limit}
+        )
+
+    async def get_products_by_names(
+        self,
+        names: List[str],
+        fields: List[str] | None = None,
+        fuzzy_limit: int = 1,
+    ) -> List[Dict[str, Any]]:
+        params = products_by_names_params(names, fuzzy_limit)
+        if params is None:
+            return []
+        return await self._fetchall(products_by_names_query(fields), params)
+
+    async def get_products_by_category(
+        self, category: str, limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        if self._snapshot is not None:
+            return self._snapshot.get_products_by_category(category, limit)
+        return await self._fetchall(
+            GET_PRODUCTS_BY_CATEGORY_SQL, {"category": category, "limit": limit}
+        )
+
+    async def get_product_reviews(
+        self, product_id: int, limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        if self._snapshot is not None:
+            return self._snapshot.get_product_reviews(product_id, limit)
+        return await self._fetchall(
+            GET_PRODUCT_REVIEWS_SQL, {"id": product_id, "limit": limit}
+        )
+
+    def match_entities(self, text: str) -> List[EntityMatch] | None:
+        """
+        Product, brand and category mentions in text, found in memory; None
+        when no snapshot is loaded and callers must fall back to queries.
+        """
+        if self._snapshot is None:
+            return None
+        return self._snapshot.match_entities(text)
+
+    async def list_tag_categories(self) -> List[str]:
+        if self._snapshot is not None:
+            return self._snapshot.list_tag_categories()
+        rows = await self._fetchall(LIST_TAG_CATEGORIES_SQL)
+        return [row["category"] for row in rows if row.get("category")]
+
+
+_catalog: CatalogRepository | None = None
+
+
+def set_catalog(catalog: CatalogRepository) -> None:
+    global _catalog
+    _catalog = catalog
+
+
+def get_catalog() -> CatalogRepository:
+    """Return the process-wide catalog, falling back to a dedicated pool."""
+    global _catalog
+    if _catalog is None:
+        _catalog = CatalogRepository()
+    return _catalog
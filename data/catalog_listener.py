@@ -0,0 +1,149 @@
+import os
+import json
+import asyncio
+import psycopg
+from psycopg import sql
+from dotenv import load_dotenv
+from psycopg_pool import AsyncConnectionPool
+
+from data.catalog import CatalogRepository
+from data.db import (
+    CATALOG_NOTIFY_CHANNEL,
+    CATALOG_NOTIFY_FUNCTION_SQL,
+    CATALOG_NOTIFY_TRIGGER_SQL,
+    CATALOG_NOTIFY_TRIGGERS,
+    INSTALLED_CATALOG_NOTIFY_TRIGGERS_SQL,
+    _build_db_url,
+)
+from utils import metrics
+
+load_dotenv()
+
+CATALOG_LISTEN_ENABLED = os.getenv("CATALOG_LISTEN_ENABLED", "1") == "1"
+# Notifications arriving within this window are applied as one refresh.
+CATALOG_LISTEN_BATCH_SECONDS = float(os.getenv("CATALOG_LISTEN_BATCH_SECONDS", "0.5"))
+_RECONNECT_DELAY_MAX = 30.0
+
+
+async def install_catalog_notify_triggers(pool: AsyncConnectionPool) -> bool:
+    """
+    Create the catalog change triggers that are missing; False if that failed.
+
+    Existing triggers are left alone: recreating them locks the catalog
+    tables, and every API and worker process runs this at startup.
+    """
+    try:
+        async with pool.connection() as conn:
+            await conn.execute(CATALOG_NOTIFY_FUNCTION_SQL)
+            cur = await conn.execute(
+                INSTALLED_CATALOG_NOTIFY_TRIGGERS_SQL,
+                {"names": list(CATALOG_NOTIFY_TRIGGERS)},
+            )
+            installed = {row["name"] for row in await cur.fetchall()}
+            for trigger, table in CATALOG_NOTIFY_TRIGGERS.items():
+                if trigger in installed:
+                    continue
+                await conn.execute(
+                    CATALOG_NOTIFY_TRIGGER_SQL.format(trigger=trigger, table=table)
+                )
+                print(f"Installed catalog change trigger {trigger} on {table}")
+    except Exception as e:
+        print(f"Could not install catalog change triggers: {e}")
+        return False
+    return True
+
+
+def _changed_product_id(payload: str) -> int | None:
+    try:
+        product_id = json.loads(payload).get("id")
+    except Exception:
+        return None
+    return product_id if isinstance(product_id, int) else None
+
+
+class CatalogChangeListener:
+    """
+    LISTENs on the catalog_changes channel and refreshes the changed products
+    in the catalog snapshot.
+
+    Uses its own connection, since LISTEN needs a session that stays open
+    (a transaction-mode pooler such as pgbouncer won't deliver notifications).
+    Every time LISTEN starts the whole snapshot is reloaded: changes made
+    before it (between the initial load and the first LISTEN, or while
+    disconnected) were not notified to this process.
+    """
+
+    def __init__(
+        self,
+        catalog: CatalogRepository,
+        batch_seconds: float = CATALOG_LISTEN_BATCH_SECONDS,
+    ):
+        self.catalog = catalog
+        self.batch_seconds = batch_seconds
+        self._task: asyncio.Task | None = None
+        self._listening = False
+
+    async def _listen(self) -> None:
+        async with await psycopg.AsyncConnection.connect(
+            _build_db_url(), autocommit=True
+        ) as conn:
+            await conn.execute(
+                sql.SQL("listen {}").format(sql.Identifier(CATALOG_NOTIFY_CHANNEL))
+            )
+            self._listening = True
+            print(f"Listening for catalog changes on '{CATALOG_NOTIFY_CHANNEL}'")
+            await self.catalog.refresh_snapshot()
+            while True:
+                product_ids: set[int] = set()
+                full_reload = False
+                async for notify in conn.notifies(timeout=self.batch_seconds):
+                    product_id = _changed_product_id(notify.payload)
+                    if product_id is None:
+                        full_reload = True
+                    else:
+                        product_ids.add(product_id)
+                if full_reload:
+                    await self.catalog.refresh_snapshot()
+                elif product_ids:
+                    metrics.increment("catalog_change_notifications", len(product_ids))
+                    await self.catalog.refresh_products(product_ids)
+
+    async def run(self) -> None:
+        delay = 1.0
+        while True:
+            self._listening = False
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Catalog change listener lost its connection: {e}")
+            if self._listening:
+                delay = 1.0
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _RECONNECT_DELAY_MAX)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+async def start_catalog_listener(
+    pool: AsyncConnectionPool, catalog: CatalogRepository
+) -> CatalogChangeListener | None:
+    """Install the triggers and start listening, if there is a snapshot to keep fresh."""
+    if not CATALOG_LISTEN_ENABLED or catalog.snapshot is None:
+        return None
+    await install_catalog_notify_triggers(pool)
+    listener = CatalogChangeListener(catalog)
+    listener.start()
+    return listener
@@ -0,0 +1,146 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from data.entity_matcher import EntityMatch, EntityMatcher
+from data.db import (
+    LOAD_CATALOG_REVIEWS_BY_IDS_SQL,
+    LOAD_CATALOG_REVIEWS_SQL,
+    load_catalog_products_query,
+    product_columns,
+)
+
+
+def _key(value) -> str:
+    return (value or "").strip().lower()
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """
+    Immutable in-memory copy of the products and product_reviews tables.
+
+    Lookups mirror the SQL in data/db.py (case-insensitive title/category
+    equality, categories sorted, reviews newest first) but are plain dict
+    reads. A refresh builds a new snapshot and swaps the reference, so
+    readers never see a half-loaded catalog.
+    """
+
+    products_by_id: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    by_title: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    by_category: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    categories: List[str] = field(default_factory=list)
+    reviews_by_product: Dict[int, List[Dict[str, Any]]] = field(default_factory=dict)
+    # Built with the snapshot, so every refresh also refreshes the matcher.
+    matcher: EntityMatcher = field(default_factory=lambda: EntityMatcher([]))
+    loaded_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_rows(
+        cls, products: List[Dict[str, Any]], reviews: List[Dict[str, Any]]
+    ) -> "CatalogSnapshot":
+        products_by_id: Dict[int, Dict[str, Any]] = {}
+        by_title: Dict[str, List[Dict[str, Any]]] = {}
+        by_category: Dict[str, List[Dict[str, Any]]] = {}
+        category_names: Dict[str, str] = {}
+        for product in products:
+            products_by_id[product["id"]] = product
+            by_title.setdefault(_key(product.get("title")), []).append(product)
+            category = product.get("category")
+            if category:
+                by_category.setdefault(_key(category), []).append(product)
+                category_names.setdefault(category, category)
+        for rows in by_category.values():
+            rows.sort(key=lambda p: p.get("title") or "")
+
+        reviews_by_product: Dict[int, List[Dict[str, Any]]] = {}
+        for review in reviews:
+            reviews_by_product.setdefault(review["product_id"], []).append(review)
+
+        return cls(
+            products_by_id=products_by_id,
+            by_title=by_title,
+            by_category=by_category,
+            categories=sorted(category_names),
+            reviews_by_product=reviews_by_product,
+            matcher=EntityMatcher.from_products(products),
+        )
+
+    def with_products(
+        self,
+        product_ids: set[int],
+        products: List[Dict[str, Any]],
+        reviews: List[Dict[str, Any]],
+    ) -> "CatalogSnapshot":
+        """
+        Copy of this snapshot with the given products (and their reviews)
+        replaced by freshly loaded rows; ids missing from products were deleted.
+        """
+        merged = {
+            pid: row for pid, row in self.products_by_id.items() if pid not in product_ids
+        }
+        for product in products:
+            merged[product["id"]] = product
+        kept_reviews = [
+            review
+            for pid, rows in self.reviews_by_product.items()
+            if pid not in product_ids
+            for review in rows
+        ]
+        return CatalogSnapshot.from_rows(
+            [merged[pid] for pid in sorted(merged)], kept_reviews + reviews
+        )
+
+    def get_product_by_id(self, product_id: int) -> Dict[str, Any] | None:
+        product = self.products_by_id.get(product_id)
+        return dict(product) if product else None
+
+    def get_products_by_title(
+        self, title: str, limit: int = 5, fields: List[str] | None = None
+    ) -> List[Dict[str, Any]]:
+        columns = product_columns(fields)
+        rows = self.by_title.get(_key(title), [])[:limit]
+        return [{c: row.get(c) for c in columns} for row in rows]
+
+    def get_products_by_category(
+        self, category: str, limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        rows = self.by_category.get(_key(category), [])[:limit]
+        return [
+            {"title": row.get("title"), "price": row.get("price"), "stock": row.get("stock")}
+            for row in rows
+        ]
+
+    def get_product_reviews(
+        self, product_id: int, limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        rows = self.reviews_by_product.get(product_id, [])[:limit]
+        return [
+            {k: v for k, v in row.items() if k != "product_id"} for row in rows
+        ]
+
+    def list_tag_categories(self) -> List[str]:
+        return list(self.categories)
+
+    def match_entities(self, text: str) -> List[EntityMatch]:
+        return self.matcher.find(text)
+
+
+async def load_catalog_snapshot(conn) -> CatalogSnapshot:
+    async with conn.cursor() as cur:
+        await cur.execute(load_catalog_products_query())
+        products = await cur.fetchall()
+        await cur.execute(LOAD_CATALOG_REVIEWS_SQL)
+        reviews = await cur.fetchall()
+    return CatalogSnapshot.from_rows(products, reviews)
+
+
+async def load_catalog_products(conn, product_ids: List[int]):
+    """Fetch the current rows for product_ids (products and their reviews)."""
+    params = {"ids": list(product_ids)}
+    async with conn.cursor() as cur:
+        await cur.execute(load_catalog_products_query(by_ids=True), params)
+        products = await cur.fetchall()
+        await cur.execute(LOAD_CATALOG_REVIEWS_BY_IDS_SQL, params)
+        reviews = await cur.fetchall()
+    return products, reviews
@@ -2,6 +2,7 @@ import os
 from typing import Any, Dict, List
 
 import psycopg
+from psycopg import sql
 from psycopg.rows import dict_row
 from dotenv import load_dotenv
 import json
@@ -34,121 +35,360 @@ def _connect():
     return psycopg.connect(DB_URL, row_factory=dict_row)
 
 
-def search_products_hybrid(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+# Product columns the product tools may return. Requested fields are checked
+# against this list, so only known identifiers ever reach the SQL.
+PRODUCT_DETAIL_FIELDS = (
+    "id",
+    "title",
+    "brand",
+    "category",
+    "price",
+    "rating",
+    "stock",
+    "availability_status",
+    "shipping_information",
+    "return_policy",
+    "warranty_information",
+    "sku",
+    "dimensions",
+    "weight",
+    "minimum_order_quantity",
+)
+# Always selected so results can be named and followed up on by id.
+PRODUCT_KEY_FIELDS = ("id", "title")
+HYBRID_SEARCH_DEFAULT_FIELDS = ("id", "title", "brand", "category", "price", "stock")
+
+
+def product_columns(
+    fields: List[str] | None = None,
+    default: tuple[str, ...] = PRODUCT_DETAIL_FIELDS,
+) -> List[str]:
+    """Whitelisted columns for the requested fields (all defaults when None)."""
+    if not fields:
+        return list(default)
+    wanted = {f.strip().lower() for f in fields if isinstance(f, str)}
+    return [
+        c for c in PRODUCT_DETAIL_FIELDS if c in PRODUCT_KEY_FIELDS or c in wanted
+    ]
+
+
+def _select_list(columns: List[str], table: str | None = None) -> sql.Composable:
+    if table:
+        return sql.SQL(", ").join(sql.Identifier(table, c) for c in columns)
+    return sql.SQL(", ").join(sql.Identifier(c) for c in columns)
+
+
+SEARCH_PRODUCTS_HYBRID_SQL = sql.SQL(
+    """
+select
+  {columns},
+  (p.title ilike %(q_exact)s) as exact_title_match,
+  ts_rank_cd(
+    to_tsvector(
+      'english',
+      coalesce(p.title, '') || ' ' ||
+      coalesce(p.category, '') || ' ' ||
+      coalesce(p.brand, '')
+    ),
+    websearch_to_tsquery('english', %(q_ts)s)
+  ) as keyword_rank,
+  (
+    p.title ilike %(q)s
+    or p.category ilike %(q)s
+    or p.brand ilike %(q)s
+  ) as keyword_match
+from products p
+order by
+  exact_title_match desc,
+  keyword_rank desc,
+  keyword_match desc
+limit %(limit)s
+"""
+)
+
+# Resolves several product names in one round trip: exact title matches via
+# = any(...), and for names without one, the best keyword match per name.
+GET_PRODUCTS_BY_NAMES_SQL = sql.SQL(
+    """
+with wanted as (
+  select name, ord
+  from unnest(%(names)s::text[]) with ordinality as w(name, ord)
+),
+exact as (
+  select {p_columns}, lower(p.title) as title_key
+  from products p
+  where lower(p.title) = any(%(title_keys)s)
+)
+select w.ord, w.name as requested_name, true as exact_title_match, {e_columns}
+from wanted w
+join exact e on e.title_key = lower(w.name)
+union all
+select w.ord, w.name as requested_name, false as exact_title_match, {f_columns}
+from wanted w
+cross join lateral (
+  select
+    {p_columns},
+    ts_rank_cd(
+      to_tsvector(
+        'english',
+        coalesce(p.title, '') || ' ' ||
+        coalesce(p.category, '') || ' ' ||
+        coalesce(p.brand, '')
+      ),
+      websearch_to_tsquery('english', w.name)
+    ) as keyword_rank,
+    (
+      p.title ilike '%%' || w.name || '%%'
+      or p.brand ilike '%%' || w.name || '%%'
+    ) as keyword_match
+  from products p
+  where to_tsvector(
+      'english',
+      coalesce(p.title, '') || ' ' ||
+      coalesce(p.category, '') || ' ' ||
+      coalesce(p.brand, '')
+    ) @@ websearch_to_tsquery('english', w.name)
+    or p.title ilike '%%' || w.name || '%%'
+    or p.brand ilike '%%' || w.name || '%%'
+  order by keyword_rank desc, keyword_match desc
+  limit %(fuzzy_limit)s
+) f
+where not exists (select 1 from exact e where e.title_key = lower(w.name))
+order by ord, exact_title_match desc
+"""
+)
+
+GET_PRODUCT_BY_ID_SQL = """
+select *
+from products
+where id = %(id)s
+"""
+
+GET_PRODUCTS_BY_TITLE_SQL = sql.SQL(
+    """
+select {columns}
+from products
+where lower(title) = lower(%(title)s)
+limit %(limit)s
+"""
+)
+
+GET_PRODUCTS_BY_CATEGORY_SQL = """
+select title, price, stock
+from products
+where lower(category) = lower(%(category)s)
+order by title
+limit %(limit)s
+"""
+
+GET_PRODUCT_REVIEWS_SQL = """
+select rating, comment, date, reviewer_name, reviewer_email
+from product_reviews
+where product_id = %(id)s
+order by date desc nulls last
+limit %(limit)s
+"""
+
+# Full catalog reads for the in-process snapshot (data/catalog_snapshot.py).
+LOAD_CATALOG_PRODUCTS_SQL = sql.SQL(
+    """
+select {columns}
+from products
+order by id
+"""
+)
+
+LOAD_CATALOG_REVIEWS_SQL = """
+select product_id, rating, comment, date, reviewer_name, reviewer_email
+from product_reviews
+order by product_id, date desc nulls last
+"""
+
+LOAD_CATALOG_PRODUCTS_BY_IDS_SQL = sql.SQL(
+    """
+select {columns}
+from products
+where id = any(%(ids)s)
+order by id
+"""
+)
+
+LOAD_CATALOG_REVIEWS_BY_IDS_SQL = """
+select product_id, rating, comment, date, reviewer_name, reviewer_email
+from product_reviews
+where product_id = any(%(ids)s)
+order by product_id, date desc nulls last
+"""
+
+LIST_TAG_CATEGORIES_SQL = """
+select distinct category
+from products
+where category is not null
+order by category
+"""
+
+
+def hybrid_search_params(query: str, limit: int) -> Dict[str, Any] | None:
     if not query or not query.strip():
-        return []
+        return None
     query_clean = query.strip()
-    q = f"%{query_clean}%"
-    sql = """
-    select
-      p.title,
-      p.brand,
-      p.category,
-      p.price,
-      p.stock,
-      (p.title ilike %(q_exact)s) as exact_title_match,
-      ts_rank_cd(
-        to_tsvector(
-          'english',
-          coalesce(p.title, '') || ' ' ||
-          coalesce(p.category, '') || ' ' ||
-          coalesce(p.brand, '')
-        ),
-        websearch_to_tsquery('english', %(q_ts)s)
-      ) as keyword_rank,
-      (
-        p.title ilike %(q)s
-        or p.category ilike %(q)s
-        or p.brand ilike %(q)s
-      ) as keyword_match
-    from products p
-    order by
-      exact_title_match desc,
-      keyword_rank desc,
-      keyword_match desc
-    limit %(limit)s
-    """
+    return {
+        "q": f"%{query_clean}%",
+        "q_exact": query_clean,
+        "q_ts": query_clean,
+        "limit": limit,
+    }
+
+
+def search_products_hybrid_query(fields: List[str] | None = None) -> sql.Composed:
+    columns = product_columns(fields, default=HYBRID_SEARCH_DEFAULT_FIELDS)
+    return SEARCH_PRODUCTS_HYBRID_SQL.format(columns=_select_list(columns, "p"))
+
+
+def load_catalog_products_query(by_ids: bool = False) -> sql.Composed:
+    query = LOAD_CATALOG_PRODUCTS_BY_IDS_SQL if by_ids else LOAD_CATALOG_PRODUCTS_SQL
+    return query.format(columns=_select_list(list(PRODUCT_DETAIL_FIELDS)))
+
+
+def products_by_title_query(fields: List[str] | None = None) -> sql.Composed:
+    return GET_PRODUCTS_BY_TITLE_SQL.format(columns=_select_list(product_columns(fields)))
+
+
+def products_by_names_query(fields: List[str] | None = None) -> sql.Composed:
+    columns = product_columns(fields)
+    return GET_PRODUCTS_BY_NAMES_SQL.format(
+        p_columns=_select_list(columns, "p"),
+        e_columns=_select_list(columns, "e"),
+        f_columns=_select_list(columns, "f"),
+    )
+
+
+def products_by_names_params(
+    names: List[str], fuzzy_limit: int = 1
+) -> Dict[str, Any] | None:
+    cleaned: List[str] = []
+    for name in names or []:
+        if isinstance(name, str) and name.strip() and name.strip() not in cleaned:
+            cleaned.append(name.strip())
+    if not cleaned:
+        return None
+    return {
+        "names": cleaned,
+        "title_keys": [name.lower() for name in cleaned],
+        "fuzzy_limit": fuzzy_limit,
+    }
+
+
+def search_products_hybrid(
+    query: str, limit: int = 5, fields: List[str] | None = None
+) -> List[Dict[str, Any]]:
+    params = hybrid_search_params(query, limit)
+    if params is None:
+        return []
     with _connect() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                sql,
-                {
-                    "q": q,
-                    "q_exact": query_clean,
-                    "q_ts": query_clean,
-                    "limit": limit,
-                },
-            )
+            cur.execute(search_products_hybrid_query(fields), params)
             return cur.fetchall()
 
 
 def get_product_by_id(product_id: int) -> Dict[str, Any] | None:
-    sql = """
-    select *
-    from products
-    where id = %(id)s
-    """
     with _connect() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, {"id": product_id})
+            cur.execute(GET_PRODUCT_BY_ID_SQL, {"id": product_id})
             return cur.fetchone()
 
 
-def get_products_by_title(title: str, limit: int = 5) -> List[Dict[str, Any]]:
-    sql = """
-    select *
-    from products
-    where lower(title) = lower(%(title)s)
-    limit %(limit)s
-    """
+def get_products_by_title(
+    title: str, limit: int = 5, fields: List[str] | None = None
+) -> List[Dict[str, Any]]:
     with _connect() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, {"title": title, "limit": limit})
+            cur.execute(
+                products_by_title_query(fields), {"title": title, "limit": limit}
+            )
             return cur.fetchall()
 
 
 def get_products_by_category(category: str, limit: int = 5) -> List[Dict[str, Any]]:
-    sql = """
-    select title, price, stock
-    from products
-    where lower(category) = lower(%(category)s)
-    order by title
-    limit %(limit)s
-    """
     with _connect() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, {"category": category, "limit": limit})
+            cur.execute(
+                GET_PRODUCTS_BY_CATEGORY_SQL, {"category": category, "limit": limit}
+            )
             return cur.fetchall()
 
 
 def get_product_reviews(product_id: int, limit: int = 5) -> List[Dict[str, Any]]:
-    sql = """
-    select rating, comment, date, reviewer_name, reviewer_email
-    from product_reviews
-    where product_id = %(id)s
-    order by date desc nulls last
-    limit %(limit)s
-    """
     with _connect() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, {"id": product_id, "limit": limit})
+            cur.execute(GET_PRODUCT_REVIEWS_SQL, {"id": product_id, "limit": limit})
             return cur.fetchall()
 
 
 def list_tag_categories() -> List[str]:
-    sql = """
-    select distinct category
-    from products
-    where category is not null
-    order by category
-    """
     with _connect() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql)
+            cur.execute(LIST_TAG_CATEGORIES_SQL)
             rows = cur.fetchall()
             return [row["category"] for row in rows if row.get("category")]
 
 
+CATALOG_NOTIFY_CHANNEL = "catalog_changes"
+
+# Row triggers that publish the affected product id on every catalog write,
+# so processes holding a catalog snapshot can refresh just those products.
+# Safe to run repeatedly. Replacing the function takes no lock on the
+# catalog tables, but (re)creating the triggers takes an ACCESS EXCLUSIVE
+# lock on them, so startup only creates triggers that are missing.
+CATALOG_NOTIFY_FUNCTION_SQL = """
+create or replace function notify_catalog_change() returns trigger as $$
+declare
+    changed record;
+    product_id integer;
+begin
+    if tg_op = 'DELETE' then
+        changed := old;
+    else
+        changed := new;
+    end if;
+    if tg_table_name = 'product_reviews' then
+        product_id := changed.product_id;
+    else
+        product_id := changed.id;
+    end if;
+    perform pg_notify(
+        'catalog_changes',
+        json_build_object('table', tg_table_name, 'op', tg_op, 'id', product_id)::text
+    );
+    return null;
+end;
+$$ language plpgsql;
+"""
+
+CATALOG_NOTIFY_TRIGGERS = {
+    "products_notify_change": "products",
+    "product_reviews_notify_change": "product_reviews",
+}
+
+CATALOG_NOTIFY_TRIGGER_SQL = """
+drop trigger if exists {trigger} on {table};
+create trigger {trigger}
+    after insert or update or delete on {table}
+    for each row execute function notify_catalog_change();
+"""
+
+INSTALLED_CATALOG_NOTIFY_TRIGGERS_SQL = """
+select tgname as name
+from pg_trigger
+where not tgisinternal and tgname = any(%(names)s)
+"""
+
+CATALOG_NOTIFY_TRIGGERS_SQL = CATALOG_NOTIFY_FUNCTION_SQL + "".join(
+    CATALOG_NOTIFY_TRIGGER_SQL.format(trigger=trigger, table=table)
+    for trigger, table in CATALOG_NOTIFY_TRIGGERS.items()
+)
+
+
 def init_db():
     """Initializes the database schema."""
     with _connect() as conn:
@@ -193,6 +433,7 @@ def init_db():
                 );
             """
             )
+            cur.execute(CATALOG_NOTIFY_TRIGGERS_SQL)
 
 
 def seed_db():
@@ -0,0 +1,130 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Shorter names (e.g. two-letter brands) match inside too many messages.
+_MIN_PATTERN_CHARS = 3
+
+
+def normalize(text: str | None) -> str:
+    return " ".join((text or "").lower().split())
+
+
+@dataclass(frozen=True)
+class EntityMatch:
+    kind: str  # "product", "brand" or "category"
+    name: str  # the catalog name as stored
+    value: Any  # product id for products, the name otherwise
+    start: int  # span in the normalized message
+    end: int
+
+
+class EntityMatcher:
+    """
+    Aho–Corasick automaton over catalog names (product titles, brands and
+    categories). find() scans a message once, whatever the number of names,
+    and returns whole-word mentions. A mention inside a longer mention of the
+    same kind ("Apple" inside "Green Apple Juice") is dropped.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str, Any]]):
+        # entries are (kind, name, value)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._patterns: List[Tuple[str, List[Tuple[str, str, Any]]]] = []
+        index: Dict[str, int] = {}
+
+        for kind, name, value in entries:
+            pattern = normalize(name)
+            if len(pattern) < _MIN_PATTERN_CHARS:
+                continue
+            if pattern not in index:
+                index[pattern] = len(self._patterns)
+                self._patterns.append((pattern, []))
+                self._add(pattern, index[pattern])
+            self._patterns[index[pattern]][1].append((kind, name, value))
+        self._link()
+
+    @classmethod
+    def from_products(cls, products: Iterable[Dict[str, Any]]) -> "EntityMatcher":
+        entries: List[Tuple[str, str, Any]] = []
+        brands = set()
+        categories = set()
+        for product in products:
+            if product.get("title"):
+                entries.append(("product", product["title"], product.get("id")))
+            if product.get("brand"):
+                brands.add(product["brand"])
+            if product.get("category"):
+                categories.add(product["category"])
+        entries.extend(("brand", b, b) for b in sorted(brands))
+        entries.extend(("category", c, c) for c in sorted(categories))
+        return cls(entries)
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def _add(self, pattern: str, pattern_id: int) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(pattern_id)
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._out[nxt].extend(self._out[self._fail[nxt]])
+
+    def find(self, text: str) -> List[EntityMatch]:
+        haystack = normalize(text)
+        matches: List[EntityMatch] = []
+        state = 0
+        for i, ch in enumerate(haystack):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for pattern_id in self._out[state]:
+                pattern, targets = self._patterns[pattern_id]
+                start, end = i - len(pattern) + 1, i + 1
+                if not _is_word(haystack, start, end):
+                    continue
+                for kind, name, value in targets:
+                    matches.append(EntityMatch(kind, name, value, start, end))
+        return _drop_nested(matches)
+
+
+def _is_word(text: str, start: int, end: int) -> bool:
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not before.isalnum() and not after.isalnum()
+
+
+def _drop_nested(matches: List[EntityMatch]) -> List[EntityMatch]:
+    kept: List[EntityMatch] = []
+    for match in matches:
+        nested = any(
+            other.kind == match.kind
+            and other.start <= match.start
+            and other.end >= match.end
+            and (other.end - other.start) > (match.end - match.start)
+            for other in matches
+        )
+        if not nested:
+            kept.append(match)
+    kept.sort(key=lambda m: (m.start, m.kind))
+    return kept
@@ -0,0 +1,273 @@
+from typing import Any, Dict
+
+from psycopg.types.json import Jsonb
+from psycopg_pool import AsyncConnectionPool
+
+from utils import metrics
+
+
+JOB_QUEUE_DDL = """
+create table if not exists inbound_jobs (
+    id bigserial primary key,
+    platform text not null,
+    payload jsonb not null,
+    status text not null default 'pending',
+    attempts integer not null default 0,
+    available_at timestamptz not null default now(),
+    locked_until timestamptz,
+    last_error text,
+    replies jsonb not null default '{}'::jsonb,
+    thread_keys text[] not null default '{}',
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+alter table inbound_jobs
+    add column if not exists replies jsonb not null default '{}'::jsonb;
+alter table inbound_jobs
+    add column if not exists thread_keys text[] not null default '{}';
+create index if not exists inbound_jobs_claim_idx
+    on inbound_jobs (status, available_at, id);
+create index if not exists inbound_jobs_thread_keys_idx
+    on inbound_jobs using gin (thread_keys);
+"""
+
+# thread_keys lists the conversation threads a job runs turns for.
+ENQUEUE_JOB_SQL = """
+insert into inbound_jobs (platform, payload, thread_keys)
+values (%(platform)s, %(payload)s, %(thread_keys)s)
+returning id
+"""
+
+# Claims are serialized across workers so two of them can't both see a
+# thread as free and claim jobs for it at the same time.
+CLAIM_LOCK_SQL = """
+select pg_advisory_xact_lock(hashtext('inbound_jobs_claim'))
+"""
+
+# Claims the oldest runnable job. Jobs stuck in "running" past their
+# visibility timeout (crashed or stalled worker) become claimable again.
+# A job waits while one of its threads has a live run elsewhere or an
+# older unfinished job, so each conversation's turns run one at a time,
+# in order, across all worker processes.
+CLAIM_JOB_SQL = """
+update inbound_jobs
+set status = 'running',
+    attempts = attempts + 1,
+    locked_until = now() + make_interval(secs => %(visibility_timeout)s),
+    updated_at = now()
+where id = (
+    select j.id
+    from inbound_jobs j
+    where ((j.status = 'pending' and j.available_at <= now())
+        or (j.status = 'running' and j.locked_until < now()))
+      and not exists (
+          select 1
+          from inbound_jobs other
+          where other.thread_keys && j.thread_keys
+            and other.id <> j.id
+            and ((other.status in ('pending', 'running') and other.id < j.id)
+                 or (other.status = 'running' and other.locked_until >= now()))
+      )
+    order by j.id
+    limit 1
+    for update skip locked
+)
+returning id, platform, payload, attempts, replies, thread_keys
+"""
+
+EXTEND_JOB_SQL = """
+update inbound_jobs
+set locked_until = now() + make_interval(secs => %(visibility_timeout)s),
+    updated_at = now()
+where id = %(id)s and status = 'running'
+"""
+
+# Records a generated reply, so a retry after a failed send re-sends it
+# instead of running the agent again.
+SAVE_JOB_REPLY_SQL = """
+update inbound_jobs
+set replies = replies || jsonb_build_object(%(key)s::text, %(reply)s::jsonb),
+    updated_at = now()
+where id = %(id)s
+"""
+
+COMPLETE_JOB_SQL = """
+delete from inbound_jobs
+where id = %(id)s
+"""
+
+# A payload, when given, replaces the job's (see PartialJobFailure).
+RETRY_JOB_SQL = """
+update inbound_jobs
+set status = 'pending',
+    payload = coalesce(%(payload)s::jsonb, payload),
+    available_at = now() + make_interval(secs => %(delay)s),
+    locked_until = null,
+    last_error = %(error)s,
+    updated_at = now()
+where id = %(id)s
+"""
+
+# Puts a job back without spending an attempt (the run never started).
+DEFER_JOB_SQL = """
+update inbound_jobs
+set status = 'pending',
+    attempts = greatest(attempts - 1, 0),
+    available_at = now() + make_interval(secs => %(delay)s),
+    locked_until = null,
+    updated_at = now()
+where id = %(id)s
+"""
+
+FAIL_JOB_SQL = """
+update inbound_jobs
+set status = 'failed',
+    payload = coalesce(%(payload)s::jsonb, payload),
+    locked_until = null,
+    last_error = %(error)s,
+    updated_at = now()
+where id = %(id)s
+"""
+
+
+class PartialJobFailure(Exception):
+    """
+    Raised by a handler when only part of a job failed. The job is retried
+    (or finally marked failed) with `payload`, the part still unanswered,
+    so the answered part isn't run again.
+    """
+
+    def __init__(self, payload: dict, error: Exception):
+        super().__init__(f"{type(error).__name__}: {error}")
+        self.payload = payload
+        self.error = error
+
+
+class JobReplies:
+    """
+    Replies already generated for a job's messages, keyed per message.
+
+    By the time a reply is sent the turn is in the checkpoint, so retrying a
+    job whose send failed must not run the agent again: that would add the
+    message and a second answer to the thread. Handlers save each reply as
+    soon as it is generated and, when one is already saved, only send it.
+    Without a job (e.g. called directly) replies are kept in memory only.
+    """
+
+    def __init__(
+        self,
+        pool: AsyncConnectionPool | None = None,
+        job_id: int | None = None,
+        saved: Dict[str, Any] | None = None,
+    ):
+        self._pool = pool
+        self._job_id = job_id
+        self._saved: Dict[str, Any] = dict(saved or {})
+
+    def get(self, key) -> Dict[str, Any] | None:
+        return self._saved.get(str(key))
+
+    async def save(self, key, reply: Dict[str, Any]) -> None:
+        self._saved[str(key)] = reply
+        if self._pool is None:
+            return
+        try:
+            async with self._pool.connection() as conn:
+                await conn.execute(
+                    SAVE_JOB_REPLY_SQL,
+                    {"id": self._job_id, "key": str(key), "reply": Jsonb(reply)},
+                )
+        except Exception as e:
+            # Still deliver it; only a retry would have to regenerate it.
+            print(f"Could not save the reply for job {self._job_id}: {e}")
+            metrics.increment("job_bookkeeping_errors")
+
+
+async def setup_job_queue(pool: AsyncConnectionPool) -> None:
+    async with pool.connection() as conn:
+        await conn.execute(JOB_QUEUE_DDL)
+
+
+async def enqueue_job(
+    pool: AsyncConnectionPool,
+    platform: str,
+    payload: dict,
+    thread_keys: list[str] | None = None,
+) -> int:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                ENQUEUE_JOB_SQL,
+                {
+                    "platform": platform,
+                    "payload": Jsonb(payload),
+                    "thread_keys": sorted(set(thread_keys or [])),
+                },
+            )
+            row = await cur.fetchone()
+            return row["id"]
+
+
+async def claim_job(
+    pool: AsyncConnectionPool, visibility_timeout: float
+) -> Dict[str, Any] | None:
+    async with pool.connection() as conn:
+        # The pool is in autocommit mode; the lock lasts until this commits.
+        async with conn.transaction(), conn.cursor() as cur:
+            await cur.execute(CLAIM_LOCK_SQL)
+            await cur.execute(
+                CLAIM_JOB_SQL, {"visibility_timeout": visibility_timeout}
+            )
+            return await cur.fetchone()
+
+
+async def extend_job(
+    pool: AsyncConnectionPool, job_id: int, visibility_timeout: float
+) -> None:
+    async with pool.connection() as conn:
+        await conn.execute(
+            EXTEND_JOB_SQL, {"id": job_id, "visibility_timeout": visibility_timeout}
+        )
+
+
+async def complete_job(pool: AsyncConnectionPool, job_id: int) -> None:
+    async with pool.connection() as conn:
+        await conn.execute(COMPLETE_JOB_SQL, {"id": job_id})
+
+
+async def retry_job(
+    pool: AsyncConnectionPool,
+    job_id: int,
+    error: str,
+    delay: float,
+    payload: dict | None = None,
+) -> None:
+    async with pool.connection() as conn:
+        await conn.execute(
+            RETRY_JOB_SQL,
+            {
+                "id": job_id,
+                "error": error,
+                "delay": delay,
+                "payload": Jsonb(payload) if payload is not None else None,
+            },
+        )
+
+
+async def defer_job(pool: AsyncConnectionPool, job_id: int, delay: float) -> None:
+    async with pool.connection() as conn:
+        await conn.execute(DEFER_JOB_SQL, {"id": job_id, "delay": delay})
+
+
+async def fail_job(
+    pool: AsyncConnectionPool, job_id: int, error: str, payload: dict | None = None
+) -> None:
+    async with pool.connection() as conn:
+        await conn.execute(
+            FAIL_JOB_SQL,
+            {
+                "id": job_id,
+                "error": error,
+                "payload": Jsonb(payload) if payload is not None else None,
+            },
+        )
@@ -1,10 +1,14 @@
 import os
+import re
 import json
+import time
+import asyncio
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_chroma import Chroma
 from langchain_ollama import OllamaEmbeddings
+from langchain_core.runnables import RunnableConfig
 from langchain_core.messages import (
     AIMessage,
     BaseMessage,
@@ -13,74 +17,212 @@ from langchain_core.messages import (
     RemoveMessage,
     ToolMessage,
 )
-from api.schemas import ChatbotState
-from data.db import get_products_by_title, list_tag_categories, search_products_hybrid
+from api.schemas import (
+    ChatbotState,
+    ProductDetailItem,
+    TurnIndex,
+    empty_turn_index,
+    update_turn_index,
+)
+from data.catalog import get_catalog
+from data.db import PRODUCT_DETAIL_FIELDS
+from data.entity_matcher import normalize
 from tools.qa import TOOLS
 from prompts import system_prompt
-from utils.llm_provider import get_llm
+from utils import metrics
+from utils.llm_provider import get_shared_llm
+from utils.llm_scheduler import BACKGROUND, llm_scheduler, priority_from_config
+from utils.context_budget import (
+    CONTEXT_TOKEN_BUDGET,
+    SUMMARY_KEEP_TOKENS,
+    SUMMARY_TRIGGER_TOKENS,
+    estimate_tokens,
+    history_budget,
+    message_tokens,
+    record_prompt_size,
+    tool_schema_tokens,
+)
 
 
 load_dotenv(".env")
 
 
-def build_graph(checkpointer=None):
-    llm = get_llm()
-
+def build_tool_vectorstore() -> Chroma:
     embeddings = OllamaEmbeddings(
         model=os.getenv("OLLAMA_EMBEDDING_MODEL", "embeddinggemma:300m"),
     )
 
-    vectorstore = Chroma(
+    return Chroma(
         persist_directory="./data/chroma_db",
         embedding_function=embeddings,
         collection_name="tools",
     )
 
-    summary_trigger_turns = int(os.getenv("SUMMARY_TRIGGER_TURNS", "8"))
-    summary_keep_turns = int(os.getenv("SUMMARY_KEEP_TURNS", "3"))
-    summary_max_chars = int(os.getenv("SUMMARY_MAX_CHARS", "1200"))
-    if summary_keep_turns >= summary_trigger_turns:
-        summary_keep_turns = max(1, summary_trigger_turns - 1)
-
-    def _split_turns(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
-        turns: list[list[BaseMessage]] = []
-        current: list[BaseMessage] = []
-        for msg in messages:
-            if isinstance(msg, HumanMessage) and current:
-                turns.append(current)
-                current = []
-            current.append(msg)
-        if current:
-            turns.append(current)
-        return turns
-
-    def _flatten(turns: list[list[BaseMessage]]) -> list[BaseMessage]:
-        flattened: list[BaseMessage] = []
-        for turn in turns:
-            flattened.extend(turn)
-        return flattened
-
-    def _message_to_text(msg: BaseMessage) -> str | None:
-        if isinstance(msg, HumanMessage):
-            role = "User"
-        elif isinstance(msg, AIMessage):
-            role = "Assistant"
-        else:
-            return None
 
-        content = msg.content
-        if isinstance(content, list):
-            parts: list[str] = []
-            for part in content:
-                if isinstance(part, str):
-                    parts.append(part)
-                elif isinstance(part, dict) and "text" in part:
-                    parts.append(str(part["text"]))
-            content = " ".join(part for part in parts if part)
+def with_checkpointer(graph, checkpointer):
+    """
+    Attach a checkpointer to an already compiled graph without recompiling it.
+    The compiled graph is shared across conversations, so each invocation
+    gets its own shallow copy bound to the checkpointer it should use.
+    """
+    return graph.copy(update={"checkpointer": checkpointer})
+
+
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "1200"))
+# Answered turns whose tool results stay verbatim for follow-up questions;
+# tool results in older turns are reduced to ids and titles.
+TOOL_RESULT_KEEP_TURNS = max(1, int(os.getenv("TOOL_RESULT_KEEP_TURNS", "1")))
+# Messages that likely want reviews; the router prefetches them for the
+# products it resolved.
+REVIEW_INTENT_PATTERN = re.compile(
+    r"\b(reviews?|reviewed|feedback|opinions?|what do (people|customers) (think|say)|any good)\b",
+    re.IGNORECASE,
+)
 
-        if not content:
-            return None
-        return f"{role}: {content}"
+
+def _message_to_text(msg: BaseMessage) -> str | None:
+    if isinstance(msg, HumanMessage):
+        role = "User"
+    elif isinstance(msg, AIMessage):
+        role = "Assistant"
+    else:
+        return None
+
+    content = msg.content
+    if isinstance(content, list):
+        parts: list[str] = []
+        for part in content:
+            if isinstance(part, str):
+                parts.append(part)
+            elif isinstance(part, dict) and "text" in part:
+                parts.append(str(part["text"]))
+        content = " ".join(part for part in parts if part)
+
+    if not content:
+        return None
+    return f"{role}: {content}"
+
+
+def _render_for_summary(messages: list[BaseMessage]) -> str:
+    lines: list[str] = []
+    for msg in messages:
+        line = _message_to_text(msg)
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def _extend_op(messages: list[BaseMessage], start: int) -> dict:
+    return {
+        "op": "extend",
+        "start": start,
+        "entries": [(isinstance(m, HumanMessage), message_tokens(m)) for m in messages],
+    }
+
+
+def turn_index_catch_up(state: ChatbotState) -> dict | None:
+    """
+    Op that brings state["turn_index"] up to date with state["messages"].
+    Only messages added since the index was last written are measured.
+    """
+    index = state.get("turn_index") or empty_turn_index()
+    messages = state.get("messages") or []
+    if index["indexed"] > len(messages):
+        # Messages were removed behind the index's back: rebuild it once.
+        rebuilt = update_turn_index(None, _extend_op(messages, 0))
+        return {"op": "reset", "index": rebuilt}
+    if index["indexed"] == len(messages):
+        return None
+    return _extend_op(messages[index["indexed"] :], index["indexed"])
+
+
+def _current_turn_index(state: ChatbotState) -> tuple[TurnIndex, dict | None]:
+    op = turn_index_catch_up(state)
+    return update_turn_index(state.get("turn_index"), op), op
+
+
+def _turns_to_keep(turn_tokens: list[int], budget: int) -> int:
+    """Number of most recent turns that fit in budget tokens (at least one)."""
+    kept = 0
+    used = 0
+    for tokens in reversed(turn_tokens):
+        used += tokens
+        if kept and used > budget:
+            break
+        kept += 1
+    return kept
+
+
+def needs_compaction(state: ChatbotState) -> bool:
+    index, _ = _current_turn_index(state)
+    return index["total_tokens"] > SUMMARY_TRIGGER_TOKENS
+
+
+async def compact_history(llm, state: ChatbotState) -> dict:
+    """
+    Fold older turns into the running summary, keeping the most recent turns
+    that fit in SUMMARY_KEEP_TOKENS verbatim.
+
+    Returns a state update (new summary, RemoveMessages for the folded turns
+    and the matching turn_index op), or {} when there is nothing to compact.
+    Runs after the reply has been delivered, so it uses the background LLM
+    priority.
+    """
+    index, _ = _current_turn_index(state)
+    keep = _turns_to_keep(index["tokens"], SUMMARY_KEEP_TOKENS)
+    drop = len(index["counts"]) - keep
+    if drop <= 0:
+        return {}
+
+    messages_to_summarize = (state.get("messages") or [])[: sum(index["counts"][:drop])]
+
+    summary_input = _render_for_summary(messages_to_summarize)
+    if not summary_input.strip() and not state.get("summary"):
+        return {}
+
+    summary_system_prompt = (
+        "You are a summarization assistant. Update the running summary of a "
+        "customer support chat. Preserve user preferences, constraints, "
+        "product interests, decisions, and unresolved questions. Avoid tool "
+        "call details. Write plain text, no bullets."
+    )
+    if SUMMARY_MAX_CHARS > 0:
+        summary_system_prompt += f" Keep it under {SUMMARY_MAX_CHARS} characters."
+
+    summary_prompt = (
+        f"Existing summary:\n{state.get('summary') or ''}\n\n"
+        f"New conversation to summarize:\n{summary_input}\n\n"
+        "Updated summary:"
+    )
+    summary_response = await llm_scheduler.ainvoke(
+        llm,
+        [
+            SystemMessage(content=summary_system_prompt),
+            HumanMessage(content=summary_prompt),
+        ],
+        priority=BACKGROUND,
+    )
+    new_summary = (summary_response.content or "").strip()
+    if SUMMARY_MAX_CHARS > 0 and len(new_summary) > SUMMARY_MAX_CHARS:
+        new_summary = new_summary[:SUMMARY_MAX_CHARS].rstrip()
+
+    # Correctly remove the summarized messages using RemoveMessage
+    messages_to_remove = [
+        RemoveMessage(id=m.id) for m in messages_to_summarize if m.id
+    ]
+
+    return {
+        "summary": new_summary,
+        "messages": messages_to_remove,
+        "turn_index": {"op": "drop", "turns": drop},
+    }
+
+
+def build_graph(checkpointer=None, llm=None, vectorstore=None):
+    if llm is None:
+        llm = get_shared_llm()
+    if vectorstore is None:
+        vectorstore = build_tool_vectorstore()
 
     def _tool_payload(message: ToolMessage) -> dict | None:
         content = message.content
@@ -101,64 +243,178 @@ def build_graph(checkpointer=None):
                 return None
         return None
 
-    def _render_for_summary(messages: list[BaseMessage]) -> str:
-        lines: list[str] = []
-        for msg in messages:
-            line = _message_to_text(msg)
-            if line:
-                lines.append(line)
-        return "\n".join(lines)
-
-    def _needs_summary(state: ChatbotState) -> str:
-        turns = _split_turns(state["messages"])
-        return "summarize" if len(turns) > summary_trigger_turns else "assistant"
-
-    def _data_driven_tool_filter(text: str, tools: list[str]) -> list[str]:
-        if not text or not tools:
-            return tools
-
-        tool_set = set(tools)
-        if (
-            "get_product_by_name" not in tool_set
-            or "get_products_in_category" not in tool_set
-        ):
-            return tools
+    def _stub_tool_payload(payload: dict) -> dict | None:
+        items = payload.get("items")
+        if payload.get("compacted") or not isinstance(items, list):
+            return None
+        stub = {"type": payload.get("type"), "compacted": True}
+        if payload.get("category"):
+            stub["category"] = payload["category"]
+        if items and all(isinstance(item, dict) for item in items):
+            stub["items"] = [
+                {k: item[k] for k in ("id", "title") if item.get(k) is not None}
+                for item in items
+            ]
+        else:
+            stub["item_count"] = len(items)
+        return stub
+
+    async def compact_tool_results(state: ChatbotState) -> dict:
+        """
+        After the reply, shrink tool results in every turn older than
+        TOOL_RESULT_KEEP_TURNS that hasn't been compacted yet, so full product
+        JSON isn't re-sent to the model and re-written to every checkpoint on
+        later turns. Also drops this turn's prefetched catalog rows.
+        """
+        index, index_op = _current_turn_index(state)
+        counts = index["counts"]
+        target = len(counts) - TOOL_RESULT_KEEP_TURNS
+        done = index.get("compacted", 0)
+        if target <= done:
+            if index_op:
+                return {"turn_index": index_op, "prefetched": None}
+            return {"prefetched": None}
+
+        ops = [index_op]
+        stubs: list[ToolMessage] = []
+        saved = 0
+        start = sum(counts[:done])
+        for turn in range(done, target):
+            end = start + counts[turn]
+            delta = 0
+            for message in state["messages"][start:end]:
+                if not isinstance(message, ToolMessage):
+                    continue
+                payload = _tool_payload(message)
+                stub = _stub_tool_payload(payload) if isinstance(payload, dict) else None
+                if stub is None:
+                    continue
+                # Same id, so add_messages replaces the original in place.
+                replacement = ToolMessage(
+                    content=json.dumps(stub),
+                    tool_call_id=message.tool_call_id,
+                    name=message.name,
+                    id=message.id,
+                )
+                change = message_tokens(replacement) - message_tokens(message)
+                if change >= 0:
+                    # Already small (e.g. a single-field lookup); keep it.
+                    continue
+                delta += change
+                stubs.append(replacement)
+            if delta:
+                ops.append({"op": "adjust", "turn": turn, "tokens": delta})
+                saved += delta
+            start = end
+        ops.append({"op": "compacted", "turns": target})
+
+        update = {"turn_index": ops, "prefetched": None}
+        if stubs:
+            print(f"--- Compacted {len(stubs)} tool results ({saved} tokens) ---")
+            update["messages"] = stubs
+        return update
+
+    # Tool schema token counts per bound tool set; schemas never change.
+    schema_tokens: dict[tuple[str, ...], int] = {}
+
+    def _fit_history(
+        messages: list[BaseMessage], index: TurnIndex, budget: int
+    ) -> tuple[list[BaseMessage], int, int]:
+        """Return the messages to send, their token estimate and how many were left out."""
+        if index["total_tokens"] <= budget:
+            return messages, index["total_tokens"], 0
+        # Drop whole turns so tool calls stay paired with their results; the
+        # current turn is always sent.
+        keep = _turns_to_keep(index["tokens"], budget)
+        history = messages[-sum(index["counts"][-keep:]) :]
+        return history, sum(index["tokens"][-keep:]), len(messages) - len(history)
+
+    def _detail_row(product: dict) -> dict:
+        # Same shape get_product_by_name returns, and safe to checkpoint.
+        return ProductDetailItem(
+            **{k: product[k] for k in PRODUCT_DETAIL_FIELDS if k in product}
+        ).model_dump()
+
+    async def _resolve_entities(catalog, text: str):
+        """
+        Return (product_hit, category_hit, products), where products maps a
+        normalized title to the detail rows of the products it names.
+        """
+        matches = catalog.match_entities(text)
+        if matches is None:
+            return await _query_entities(catalog, text)
+
+        # One pass over the message against every catalog name, in memory.
+        products: dict[str, list[dict]] = {}
+        for match in matches:
+            if match.kind != "product":
+                continue
+            product = await catalog.get_product_by_id(match.value)
+            if product:
+                products.setdefault(normalize(match.name), []).append(
+                    _detail_row(product)
+                )
+        if matches:
+            print(
+                "DEBUG: Matched entities: "
+                + ", ".join(f"{m.kind}={m.name!r}" for m in matches)
+            )
+        product_hit = any(m.kind == "product" for m in matches)
+        category_hit = any(m.kind == "category" for m in matches)
+        return product_hit, category_hit, products
 
+    async def _query_entities(catalog, text: str):
+        # Without a snapshot, probe the database instead. The product and
+        # category lookups are independent, so they run side by side.
         text_lower = text.lower()
-        product_hit = False
-        category_hit = False
+        fields = list(PRODUCT_DETAIL_FIELDS)
 
-        try:
-            products = get_products_by_title(text, limit=1)
-        except Exception:
-            products = []
+        async def find_products() -> dict[str, list[dict]]:
+            try:
+                rows = await catalog.get_products_by_title(text, limit=5, fields=fields)
+            except Exception:
+                rows = []
+            if rows:
+                return {normalize(text): [_detail_row(row) for row in rows]}
 
-        if products:
-            product_hit = True
-        else:
             try:
-                candidates = search_products_hybrid(text, limit=1)
+                candidates = await catalog.search_products_hybrid(
+                    text, limit=1, fields=fields
+                )
             except Exception:
                 candidates = []
-
             if candidates:
                 candidate = candidates[0]
                 title = (candidate.get("title") or "").lower()
-                if title and title in text_lower:
-                    product_hit = True
-                elif candidate.get("exact_title_match"):
-                    product_hit = True
-
-        try:
-            categories = list_tag_categories()
-        except Exception:
-            categories = []
-
-        for category in categories:
-            cat = (category or "").lower().strip()
-            if cat and cat in text_lower:
-                category_hit = True
-                break
+                if (title and title in text_lower) or candidate.get(
+                    "exact_title_match"
+                ):
+                    return {normalize(candidate.get("title")): [_detail_row(candidate)]}
+            return {}
+
+        async def find_category() -> bool:
+            try:
+                categories = await catalog.list_tag_categories()
+            except Exception:
+                categories = []
+            for category in categories:
+                cat = (category or "").lower().strip()
+                if cat and cat in text_lower:
+                    return True
+            return False
+
+        products, category_hit = await asyncio.gather(find_products(), find_category())
+        return bool(products), category_hit, products
+
+    def _data_driven_tool_filter(
+        tools: list[str], product_hit: bool, category_hit: bool
+    ) -> list[str]:
+        tool_set = set(tools)
+        if (
+            "get_product_by_name" not in tool_set
+            or "get_products_in_category" not in tool_set
+        ):
+            return tools
 
         print(
             "DEBUG: Data-driven routing product_hit="
@@ -171,22 +427,87 @@ def build_graph(checkpointer=None):
             return [t for t in tools if t != "get_product_by_name"]
         return tools
 
+    async def _prefetch_reviews(products: dict[str, list[dict]]) -> dict[str, list[dict]]:
+        """Fetch reviews for the resolved products before the model asks for them."""
+        catalog = get_catalog()
+        product_ids = list(
+            dict.fromkeys(
+                rows[0]["id"]
+                for rows in products.values()
+                if rows and rows[0].get("id") is not None
+            )
+        )
+
+        async def fetch(product_id: int) -> list[dict] | None:
+            try:
+                found = await catalog.get_product_reviews(product_id, limit=5)
+            except Exception:
+                return None
+            return [{"comment": r.get("comment")} for r in found]
+
+        results = await asyncio.gather(*(fetch(pid) for pid in product_ids))
+        return {
+            str(pid): rows for pid, rows in zip(product_ids, results) if rows is not None
+        }
+
+    async def _search_tools(text: str) -> tuple[list[str], float]:
+        started = time.perf_counter()
+        # Embedding call plus Chroma query, both blocking; keep them off the loop.
+        docs = await asyncio.to_thread(vectorstore.similarity_search, text, k=3)
+        return [doc.metadata["name"] for doc in docs], time.perf_counter() - started
+
+    async def _route_entities(text: str):
+        """Return ((product_hit, category_hit, products), reviews, seconds)."""
+        started = time.perf_counter()
+        if not text:
+            return (False, False, {}), {}, 0.0
+        hits = await _resolve_entities(get_catalog(), text)
+        reviews: dict[str, list[dict]] = {}
+        if hits[2] and REVIEW_INTENT_PATTERN.search(text):
+            # Speculative, and overlapped with the embedding search that is
+            # still running; discarded if the review tool isn't retrieved.
+            reviews = await _prefetch_reviews(hits[2])
+        return hits, reviews, time.perf_counter() - started
+
     async def tool_retriever(state: ChatbotState) -> dict:
         print("--- Retrieving relevant tools... ---")
+        started = time.perf_counter()
         last_message = state["messages"][-1].content
         if not isinstance(last_message, str):
             # Handle cases where message might be a list of parts
             last_message = str(last_message)
 
-        docs = vectorstore.similarity_search(last_message, k=3)
-        tool_names = [doc.metadata["name"] for doc in docs]
-        filtered_tools = _data_driven_tool_filter(last_message, tool_names)
+        # Entity routing doesn't depend on which tools were retrieved, so both
+        # run at once and the node takes as long as the slower of the two.
+        (tool_names, search_seconds), (hits, reviews, routing_seconds) = (
+            await asyncio.gather(
+                _search_tools(last_message), _route_entities(last_message)
+            )
+        )
+        product_hit, category_hit, products = hits
+        filtered_tools = _data_driven_tool_filter(tool_names, product_hit, category_hit)
         print(f"DEBUG: Retrieved tools: {tool_names}")
         if filtered_tools != tool_names:
             print(f"DEBUG: Filtered tools: {filtered_tools}")
-        return {"retrieved_tools": filtered_tools}
+        if "get_product_reviews" not in filtered_tools:
+            reviews = {}
+        if reviews:
+            print(f"DEBUG: Prefetched reviews for products {list(reviews)}")
+
+        total_seconds = time.perf_counter() - started
+        metrics.observe("tool_search_seconds", search_seconds)
+        metrics.observe("entity_routing_seconds", routing_seconds)
+        metrics.observe("tool_retriever_seconds", total_seconds)
+        print(
+            f"DEBUG: tool_retriever took {total_seconds:.3f}s "
+            f"(search {search_seconds:.3f}s, "
+            f"routing incl. review prefetch {routing_seconds:.3f}s)"
+        )
 
-    async def assistant(state: ChatbotState) -> dict:
+        prefetched = {"products": products, "reviews": reviews} if products else None
+        return {"retrieved_tools": filtered_tools, "prefetched": prefetched}
+
+    async def assistant(state: ChatbotState, config: RunnableConfig) -> dict:
         print("--- Assistant thinking... ---")
 
         last_message = state["messages"][-1] if state["messages"] else None
@@ -247,51 +568,31 @@ def build_graph(checkpointer=None):
                 "Note: The conversation is already in progress. Do NOT repeat the welcome message."
             )
 
-        messages = [SystemMessage(content=full_system_content)] + state["messages"]
-        response = await llm_with_tools.ainvoke(messages)
-        return {"messages": [response]}
-
-    async def summarize(state: ChatbotState) -> dict:
-        turns = _split_turns(state["messages"])
-        if len(turns) <= summary_keep_turns:
-            return {}
-
-        turns_to_summarize = turns[:-summary_keep_turns]
-
-        summary_input = _render_for_summary(_flatten(turns_to_summarize))
-        if not summary_input.strip() and not state.get("summary"):
-            return {}
-
-        summary_system_prompt = (
-            "You are a summarization assistant. Update the running summary of a "
-            "customer support chat. Preserve user preferences, constraints, "
-            "product interests, decisions, and unresolved questions. Avoid tool "
-            "call details. Write plain text, no bullets."
+        # Keep the prompt inside the context budget: older turns that don't
+        # fit are left out here and folded into the summary by compaction.
+        names = tuple(t.name for t in available_tools)
+        if names not in schema_tokens:
+            schema_tokens[names] = tool_schema_tokens(available_tools)
+        fixed_tokens = estimate_tokens(full_system_content) + schema_tokens[names]
+        index, index_op = _current_turn_index(state)
+        history, history_tokens, trimmed = _fit_history(
+            state["messages"], index, history_budget(fixed_tokens)
         )
-        if summary_max_chars > 0:
-            summary_system_prompt += f" Keep it under {summary_max_chars} characters."
-
-        summary_prompt = (
-            f"Existing summary:\n{state.get('summary') or ''}\n\n"
-            f"New conversation to summarize:\n{summary_input}\n\n"
-            "Updated summary:"
-        )
-        summary_response = await llm.ainvoke(
-            [
-                SystemMessage(content=summary_system_prompt),
-                HumanMessage(content=summary_prompt),
-            ]
+        prompt_tokens = fixed_tokens + history_tokens
+        record_prompt_size(prompt_tokens, trimmed)
+        print(
+            f"DEBUG: Prompt ~{prompt_tokens} tokens "
+            f"(budget {CONTEXT_TOKEN_BUDGET}, trimmed {trimmed} messages)"
         )
-        new_summary = (summary_response.content or "").strip()
-        if summary_max_chars > 0 and len(new_summary) > summary_max_chars:
-            new_summary = new_summary[:summary_max_chars].rstrip()
-
-        # Correctly remove the summarized messages using RemoveMessage
-        messages_to_remove = [
-            RemoveMessage(id=m.id) for m in _flatten(turns_to_summarize) if m.id
-        ]
 
-        return {"summary": new_summary, "messages": messages_to_remove}
+        messages = [SystemMessage(content=full_system_content)] + history
+        response = await llm_scheduler.ainvoke(
+            llm_with_tools, messages, priority=priority_from_config(config)
+        )
+        return {
+            "messages": [response],
+            "turn_index": [index_op, _extend_op([response], len(state["messages"]))],
+        }
 
     tool_node = ToolNode(TOOLS)
 
@@ -302,22 +603,21 @@ def build_graph(checkpointer=None):
     graph_builder = StateGraph(ChatbotState)
     graph_builder.add_node("preprocess", lambda state: {})
     graph_builder.add_node("tool_retriever", tool_retriever)
-    graph_builder.add_node("summarize", summarize)
     graph_builder.add_node("assistant", assistant)
     graph_builder.add_node("tools", debug_tool_node)
+    graph_builder.add_node("compact_tool_results", compact_tool_results)
 
     graph_builder.add_edge(START, "preprocess")
     graph_builder.add_edge("preprocess", "tool_retriever")
 
+    # Summarization happens after the reply (see compact_history), never here.
+    graph_builder.add_edge("tool_retriever", "assistant")
     graph_builder.add_conditional_edges(
-        "tool_retriever",
-        _needs_summary,
-        {"summarize": "summarize", "assistant": "assistant"},
-    )
-    graph_builder.add_edge("summarize", "assistant")
-    graph_builder.add_conditional_edges(
-        "assistant", tools_condition, {"tools": "tools", "__end__": END}
+        "assistant",
+        tools_condition,
+        {"tools": "tools", "__end__": "compact_tool_results"},
     )
+    graph_builder.add_edge("compact_tool_results", END)
     graph_builder.add_edge("tools", "assistant")
 
     return graph_builder.compile(checkpointer=checkpointer)
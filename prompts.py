@@ -15,6 +15,8 @@ system_prompt = """
     - **No monologues**: NEVER provide text, "thinking" out loud, or explanations before calling a tool. If a tool is needed, call it immediately and only provide a text response once you have the results.
     - When calling tools, pass ONLY real user-derived values. Do NOT pass schemas, type descriptors, or lists unless explicitly required.
       - For `get_products_in_category`, pass a single string like `category="groceries"`.
+      - For `get_product_by_name`, pass `fields` (e.g. `fields=["price"]`) only when the user asks about specific attributes; omit it for a general overview.
+      - When the user asks about two or more specific products (e.g. a comparison), use `get_products_by_names` with all of them in one call.
 3. **Data Integrity**: 
     - If any tool returns an empty result (no items found), do NOT make up an answer. Politely inform the user and ask for clarification or suggest a different search.
 4. **Presentation (STRICT LISTS)**:
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from utils.admission import AdmissionController, AgentBusyError
+
+
+async def _hold(controller, order, name, release):
+    async with controller.admit():
+        order.append(name)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_admits_up_to_max_in_flight_then_queues_in_order():
+    controller = AdmissionController(max_in_flight=2, max_queue=5, queue_timeout=5)
+    order = []
+    release = asyncio.Event()
+
+    tasks = [asyncio.create_task(_hold(controller, order, i, release)) for i in range(4)]
+    await asyncio.sleep(0)
+
+    assert order == [0, 1]
+    assert not controller.has_capacity()
+    assert len(controller._waiters) == 2
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+    assert order == [0, 1, 2, 3]
+    assert controller._in_flight == 0
+    assert controller.has_capacity()
+
+
+@pytest.mark.asyncio
+async def test_rejects_when_the_queue_is_full():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+    order = []
+    release = asyncio.Event()
+    tasks = [asyncio.create_task(_hold(controller, order, i, release)) for i in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(AgentBusyError, match="queue_full"):
+        async with controller.admit():
+            pass
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_rejects_after_waiting_too_long():
+    controller = AdmissionController(max_in_flight=1, max_queue=5, queue_timeout=0.01)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, [], 0, release))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AgentBusyError, match="timeout"):
+        async with controller.admit():
+            pass
+    assert not controller._waiters
+
+    release.set()
+    await holder
+    assert controller._in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_take_a_slot():
+    controller = AdmissionController(max_in_flight=1, max_queue=5, queue_timeout=5)
+    order = []
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, order, 0, release))
+    waiter = asyncio.create_task(_hold(controller, order, 1, release))
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    release.set()
+    await holder
+
+    assert order == [0]
+    assert controller._in_flight == 0
+    assert not controller._waiters
+
+
+@pytest.mark.asyncio
+async def test_wait_for_capacity_returns_once_a_slot_frees():
+    controller = AdmissionController(max_in_flight=1, max_queue=5, queue_timeout=5)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, [], 0, release))
+    await asyncio.sleep(0)
+
+    waiting = asyncio.create_task(controller.wait_for_capacity())
+    await asyncio.sleep(0)
+    assert not waiting.done()
+
+    release.set()
+    await asyncio.wait_for(waiting, timeout=1)
+    await holder
+    assert controller.has_capacity()
@@ -0,0 +1,103 @@
+from contextlib import asynccontextmanager
+
+import pytest
+
+from data import catalog_listener
+from data.catalog_listener import CatalogChangeListener, install_catalog_notify_triggers
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, installed=()):
+        self.installed = installed
+        self.statements = []
+
+    async def execute(self, query, params=None):
+        self.statements.append(str(query))
+        return FakeCursor([{"name": name} for name in self.installed])
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def connection(self):
+        yield self.conn
+
+
+def _created_triggers(conn):
+    return [s for s in conn.statements if "create trigger" in s]
+
+
+@pytest.mark.asyncio
+async def test_installs_only_missing_triggers():
+    conn = FakeConnection(installed=["products_notify_change"])
+
+    assert await install_catalog_notify_triggers(FakePool(conn))
+
+    created = _created_triggers(conn)
+    assert len(created) == 1
+    assert "on product_reviews" in created[0]
+
+
+@pytest.mark.asyncio
+async def test_leaves_existing_triggers_alone():
+    conn = FakeConnection(
+        installed=["products_notify_change", "product_reviews_notify_change"]
+    )
+
+    assert await install_catalog_notify_triggers(FakePool(conn))
+
+    assert _created_triggers(conn) == []
+
+
+class FakeListenConnection:
+    def __init__(self):
+        self.listening = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query):
+        self.listening = True
+
+    async def notifies(self, timeout):
+        raise ConnectionError("closed")
+        yield
+
+
+class FakeCatalog:
+    def __init__(self, conn):
+        self.conn = conn
+        self.reloads = []
+
+    async def refresh_snapshot(self):
+        self.reloads.append(self.conn.listening)
+
+
+@pytest.mark.asyncio
+async def test_reloads_the_snapshot_once_listening(monkeypatch):
+    conn = FakeListenConnection()
+
+    async def connect(*args, **kwargs):
+        return conn
+
+    monkeypatch.setattr(catalog_listener.psycopg.AsyncConnection, "connect", connect)
+    catalog = FakeCatalog(conn)
+
+    with pytest.raises(ConnectionError):
+        await CatalogChangeListener(catalog)._listen()
+
+    # The first LISTEN reloads too, after the channel is subscribed.
+    assert catalog.reloads == [True]
@@ -0,0 +1,17 @@
+from utils import context_budget
+from utils.context_budget import CONTEXT_TOKEN_BUDGET, SUMMARY_KEEP_TOKENS, history_budget
+
+
+def test_history_budget_is_what_the_fixed_prompt_leaves():
+    assert history_budget(0) == CONTEXT_TOKEN_BUDGET
+    assert history_budget(CONTEXT_TOKEN_BUDGET - SUMMARY_KEEP_TOKENS) == SUMMARY_KEEP_TOKENS
+
+
+def test_history_budget_keeps_some_history_when_the_prompt_fills_the_budget(
+    monkeypatch, capsys
+):
+    monkeypatch.setattr(context_budget, "_budget_warned", False)
+
+    assert history_budget(CONTEXT_TOKEN_BUDGET + 500) == SUMMARY_KEEP_TOKENS
+    assert history_budget(CONTEXT_TOKEN_BUDGET + 500) == SUMMARY_KEEP_TOKENS
+    assert capsys.readouterr().out.count("WARNING") == 1
@@ -0,0 +1,119 @@
+import random
+
+from data.entity_matcher import EntityMatcher, normalize
+
+
+PRODUCTS = [
+    {"id": 1, "title": "Essence Mascara Lash Princess", "brand": "Essence", "category": "beauty"},
+    {"id": 2, "title": "Red Lipstick", "brand": "Glamour Beauty", "category": "beauty"},
+    {"id": 3, "title": "Apple", "brand": None, "category": "groceries"},
+    {"id": 4, "title": "Green Apple Juice", "brand": "Juicy", "category": "groceries"},
+]
+
+
+def _found(matches):
+    return [(m.kind, m.name, m.value) for m in matches]
+
+
+def test_finds_products_brands_and_categories():
+    matcher = EntityMatcher.from_products(PRODUCTS)
+
+    matches = matcher.find("Is the Essence Mascara Lash Princess good for beauty?")
+
+    assert _found(matches) == [
+        ("brand", "Essence", "Essence"),
+        ("product", "Essence Mascara Lash Princess", 1),
+        ("category", "beauty", "beauty"),
+    ]
+
+
+def test_matches_whole_words_only():
+    matcher = EntityMatcher.from_products(PRODUCTS)
+
+    assert matcher.find("I love pineapples and applesauce") == []
+    assert _found(matcher.find("an apple, please")) == [("product", "Apple", 3)]
+
+
+def test_nested_match_of_same_kind_is_dropped():
+    matcher = EntityMatcher.from_products(PRODUCTS)
+
+    matches = matcher.find("green apple juice")
+
+    assert _found(matches) == [
+        ("product", "Green Apple Juice", 4),
+    ]
+
+
+def test_nested_match_of_other_kind_is_kept():
+    matcher = EntityMatcher.from_products(PRODUCTS)
+
+    matches = matcher.find("glamour beauty lipstick")
+
+    # "beauty" the category sits inside "Glamour Beauty" the brand.
+    assert _found(matches) == [
+        ("brand", "Glamour Beauty", "Glamour Beauty"),
+        ("category", "beauty", "beauty"),
+    ]
+
+
+def test_normalizes_case_and_whitespace():
+    matcher = EntityMatcher.from_products(PRODUCTS)
+
+    matches = matcher.find("  RED\n  lipstick  ")
+
+    assert _found(matches) == [("product", "Red Lipstick", 2)]
+    assert (matches[0].start, matches[0].end) == (0, len("red lipstick"))
+
+
+def test_same_name_maps_to_every_entry():
+    matcher = EntityMatcher(
+        [("product", "Kiwi", 10), ("product", "kiwi", 11), ("category", "Kiwi", "Kiwi")]
+    )
+
+    assert _found(matcher.find("kiwi")) == [
+        ("category", "Kiwi", "Kiwi"),
+        ("product", "Kiwi", 10),
+        ("product", "kiwi", 11),
+    ]
+    assert len(matcher) == 1
+
+
+def test_ignores_short_and_empty_names():
+    matcher = EntityMatcher([("brand", "HP", "HP"), ("brand", "", ""), ("brand", None, None)])
+
+    assert len(matcher) == 0
+    assert matcher.find("hp laptop") == []
+
+
+def _naive_find(names, text):
+    haystack = normalize(text)
+    found = set()
+    for name in names:
+        pattern = normalize(name)
+        start = haystack.find(pattern)
+        while start >= 0:
+            end = start + len(pattern)
+            before = haystack[start - 1] if start > 0 else " "
+            after = haystack[end] if end < len(haystack) else " "
+            if not before.isalnum() and not after.isalnum():
+                found.add((start, end, name))
+            start = haystack.find(pattern, start + 1)
+    return found
+
+
+def test_agrees_with_naive_search():
+    rng = random.Random(7)
+    alphabet = "ab c"
+    for _ in range(300):
+        names = {
+            "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 6))).strip()
+            for _ in range(rng.randint(1, 6))
+        }
+        names = [n for n in names if len(n) >= 3]
+        # Distinct kinds so nesting never drops anything.
+        matcher = EntityMatcher((f"kind{i}", n, n) for i, n in enumerate(names))
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+
+        got = {(m.start, m.end, m.name) for m in matcher.find(text)}
+
+        assert got == _naive_find(names, text), (names, text)
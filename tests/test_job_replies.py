@@ -0,0 +1,90 @@
+import pytest
+
+from api.routers import whatsapp
+from data.job_queue import JobReplies, PartialJobFailure
+
+
+def _payload(*texts):
+    return {
+        "messages": [
+            {"id": f"wamid.{i}", "from": "15550001", "text": {"body": text}}
+            for i, text in enumerate(texts)
+        ]
+    }
+
+
+@pytest.fixture
+def agent_runs(monkeypatch):
+    runs = []
+
+    async def run_agent(text, from_number, runtime):
+        runs.append(text)
+        return f"answer to {text}"
+
+    monkeypatch.setattr(whatsapp, "run_agent", run_agent)
+    return runs
+
+
+@pytest.mark.asyncio
+async def test_retry_after_a_failed_send_resends_the_saved_reply(monkeypatch, agent_runs):
+    sent = []
+
+    async def failing_enqueue(chat_id, text):
+        raise RuntimeError("send failed")
+
+    async def enqueue(chat_id, text):
+        sent.append(text)
+
+    replies = JobReplies()
+    monkeypatch.setattr(whatsapp.whatsapp_outbound, "enqueue", failing_enqueue)
+    with pytest.raises(RuntimeError):
+        await whatsapp.process_whatsapp_message(_payload("hi"), None, replies)
+
+    monkeypatch.setattr(whatsapp.whatsapp_outbound, "enqueue", enqueue)
+    await whatsapp.process_whatsapp_message(_payload("hi"), None, replies)
+
+    assert agent_runs == ["hi"]
+    assert sent == ["answer to hi"]
+
+
+@pytest.mark.asyncio
+async def test_saved_replies_come_from_the_claimed_job(monkeypatch, agent_runs):
+    sent = []
+
+    async def enqueue(chat_id, text):
+        sent.append(text)
+
+    monkeypatch.setattr(whatsapp.whatsapp_outbound, "enqueue", enqueue)
+    replies = JobReplies(saved={"wamid.0": {"text": "saved answer"}})
+
+    await whatsapp.process_whatsapp_message(_payload("hi", "more"), None, replies)
+
+    assert agent_runs == ["more"]
+    assert sent == ["saved answer", "answer to more"]
+    assert replies.get("wamid.1") == {"text": "answer to more"}
+
+
+@pytest.mark.asyncio
+async def test_partly_failed_batch_retries_only_the_unanswered_messages(monkeypatch):
+    sent = []
+
+    async def run_agent(text, from_number, runtime):
+        if text == "bad":
+            raise RuntimeError("llm down")
+        return f"answer to {text}"
+
+    async def enqueue(chat_id, text):
+        sent.append(text)
+
+    monkeypatch.setattr(whatsapp, "run_agent", run_agent)
+    monkeypatch.setattr(whatsapp.whatsapp_outbound, "enqueue", enqueue)
+    payload = _payload("ok", "bad", "after")
+    payload["messages"][0]["from"] = "15550002"
+
+    with pytest.raises(PartialJobFailure) as raised:
+        await whatsapp.process_whatsapp_message(payload, None, JobReplies())
+
+    # The failed message and the sender's later one, in order.
+    assert [m["text"]["body"] for m in raised.value.payload["messages"]] == ["bad", "after"]
+    assert isinstance(raised.value.error, RuntimeError)
+    assert sent == ["answer to ok"]
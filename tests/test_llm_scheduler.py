@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from utils.llm_scheduler import BACKGROUND, INTERACTIVE, WEBHOOK, LLMScheduler, priority_from_config
+
+
+def _scheduler(max_concurrency=1, aging_seconds=0, **caps):
+    class_concurrency = {INTERACTIVE: 2, WEBHOOK: 2, BACKGROUND: 1, **caps}
+    return LLMScheduler(max_concurrency, class_concurrency, aging_seconds)
+
+
+async def _call(scheduler, order, name, priority, release):
+    async with scheduler.slot(priority):
+        order.append(name)
+        await release.wait()
+
+
+def test_priority_from_config_falls_back_to_the_default():
+    assert priority_from_config({"configurable": {"llm_priority": INTERACTIVE}}) == INTERACTIVE
+    assert priority_from_config({"configurable": {"llm_priority": "bogus"}}) == WEBHOOK
+    assert priority_from_config(None, default=BACKGROUND) == BACKGROUND
+
+
+@pytest.mark.asyncio
+async def test_free_slot_goes_to_the_most_urgent_waiter():
+    scheduler = _scheduler()
+    order = []
+    gate, release = asyncio.Event(), asyncio.Event()
+    holder = asyncio.create_task(_call(scheduler, order, "holder", WEBHOOK, gate))
+    await asyncio.sleep(0)
+
+    tasks = [
+        asyncio.create_task(_call(scheduler, order, name, priority, release))
+        for name, priority in [("bg", BACKGROUND), ("hook", WEBHOOK), ("live", INTERACTIVE)]
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    gate.set()
+    await asyncio.gather(holder, *tasks)
+
+    assert order == ["holder", "live", "hook", "bg"]
+    assert scheduler._running == {INTERACTIVE: 0, WEBHOOK: 0, BACKGROUND: 0}
+
+
+@pytest.mark.asyncio
+async def test_class_cap_leaves_room_for_other_classes():
+    scheduler = _scheduler(max_concurrency=3)
+    order = []
+    release = asyncio.Event()
+
+    tasks = [
+        asyncio.create_task(_call(scheduler, order, name, priority, release))
+        for name, priority in [("bg1", BACKGROUND), ("bg2", BACKGROUND), ("live", INTERACTIVE)]
+    ]
+    await asyncio.sleep(0)
+
+    # Background is capped at one, so the interactive call runs beside it.
+    assert order == ["bg1", "live"]
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert order == ["bg1", "live", "bg2"]
+
+
+@pytest.mark.asyncio
+async def test_aging_promotes_a_long_waiting_background_call():
+    scheduler = _scheduler(aging_seconds=0.05)
+    order = []
+    gate, release = asyncio.Event(), asyncio.Event()
+    holder = asyncio.create_task(_call(scheduler, order, "holder", WEBHOOK, gate))
+    await asyncio.sleep(0)
+
+    old = asyncio.create_task(_call(scheduler, order, "bg", BACKGROUND, release))
+    await asyncio.sleep(0.15)
+    new = asyncio.create_task(_call(scheduler, order, "hook", WEBHOOK, release))
+    await asyncio.sleep(0)
+    release.set()
+    gate.set()
+    await asyncio.gather(holder, old, new)
+
+    assert order == ["holder", "bg", "hook"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_is_removed_from_the_queue():
+    scheduler = _scheduler()
+    order = []
+    release = asyncio.Event()
+    holder = asyncio.create_task(_call(scheduler, order, "holder", WEBHOOK, release))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(_call(scheduler, order, "waiter", INTERACTIVE, release))
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert scheduler._waiters == []
+
+    release.set()
+    await holder
+    assert order == ["holder"]
+    assert scheduler._running[INTERACTIVE] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancellation_right_after_a_grant_releases_the_slot():
+    scheduler = _scheduler()
+    order = []
+    async with scheduler.slot(WEBHOOK):
+        waiter = asyncio.create_task(_call(scheduler, order, "waiter", INTERACTIVE, asyncio.Event()))
+        await asyncio.sleep(0)
+    # Leaving the block granted the slot to the waiter; cancel it before it runs.
+    assert scheduler._running[INTERACTIVE] == 1
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert order == []
+    assert scheduler._running == {INTERACTIVE: 0, WEBHOOK: 0, BACKGROUND: 0}
@@ -0,0 +1,117 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from api.services import outbound
+from api.services.outbound import OutboundScheduler, TokenBucket, split_message
+
+
+def test_split_message_keeps_short_text_whole():
+    assert split_message("  hello world  ", 20) == ["hello world"]
+    assert split_message("", 20) == []
+
+
+def test_split_message_prefers_paragraph_then_word_boundaries():
+    text = "first paragraph here\n\nsecond one"
+
+    assert split_message(text, 25) == ["first paragraph here", "second one"]
+    assert split_message("aaaa bbbb cccc", 10) == ["aaaa bbbb", "cccc"]
+
+
+def test_split_message_hard_cuts_long_words():
+    assert split_message("x" * 25, 10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_split_message_chunks_fit_and_preserve_the_words():
+    rng = random.Random(3)
+    for _ in range(300):
+        text = "".join(rng.choice("ab \n") for _ in range(rng.randint(0, 200)))
+        limit = rng.randint(1, 30)
+
+        parts = split_message(text, limit)
+
+        assert all(0 < len(part) <= limit for part in parts)
+        assert "".join("".join(parts).split()) == "".join(text.split())
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=100.0)
+    monkeypatch.setattr(outbound, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_token_bucket_allows_a_burst_then_refills(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+
+    for _ in range(3):
+        assert bucket.wait_time() == 0
+        bucket.consume()
+    assert bucket.wait_time() == pytest.approx(0.5)
+    assert not bucket.is_full()
+
+    clock.value += 0.5
+    assert bucket.wait_time() == 0
+
+    clock.value += 10
+    assert bucket.is_full()
+    assert bucket.tokens == 3
+
+
+def test_token_bucket_capacity_is_at_least_one(clock):
+    bucket = TokenBucket(rate=1, capacity=0)
+
+    assert bucket.wait_time() == 0
+
+
+def _scheduler(send, max_chars=10):
+    return OutboundScheduler("test", send, max_chars, 1000, 1000, 1000)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_resolves_after_every_part_is_sent():
+    sent = []
+
+    async def send(chat_id, text):
+        sent.append((chat_id, text))
+
+    scheduler = _scheduler(send)
+    await scheduler.enqueue(1, "aaaa bbbb cccc")
+    await scheduler.enqueue(1, "   ")
+    await scheduler.stop()
+
+    assert sent == [("1", "aaaa bbbb"), ("1", "cccc")]
+
+
+@pytest.mark.asyncio
+async def test_enqueue_merges_messages_waiting_for_the_same_chat():
+    sent = []
+    release = asyncio.Event()
+
+    async def send(chat_id, text):
+        await release.wait()
+        sent.append(text)
+
+    scheduler = _scheduler(send, max_chars=20)
+    first = scheduler.enqueue(1, "one")
+    await asyncio.sleep(0)  # "one" is now in flight
+    second = scheduler.enqueue(1, "two")
+    third = scheduler.enqueue(1, "three")
+    release.set()
+    await asyncio.gather(first, second, third)
+    await scheduler.stop()
+
+    assert sent == ["one", "two\n\nthree"]
+
+
+@pytest.mark.asyncio
+async def test_enqueue_future_fails_with_the_send_error():
+    async def send(chat_id, text):
+        raise RuntimeError("rejected")
+
+    scheduler = _scheduler(send)
+    with pytest.raises(RuntimeError, match="rejected"):
+        await scheduler.enqueue(1, "hello")
+    await scheduler.stop()
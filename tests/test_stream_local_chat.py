@@ -0,0 +1,68 @@
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from agent import StreamReset, stream_local_chat
+
+
+class FakeGraph:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def astream(self, inputs, config, stream_mode):
+        for node, chunk in self.chunks:
+            yield chunk, {"langgraph_node": node}
+
+
+def _text(message_id, text):
+    return "assistant", AIMessageChunk(id=message_id, content=text)
+
+
+def _tool_call(message_id):
+    return "assistant", AIMessageChunk(
+        id=message_id,
+        content="",
+        tool_call_chunks=[
+            {"name": "get_product_reviews", "args": "{}", "id": "call-1", "index": 0}
+        ],
+    )
+
+
+async def _collect(chunks):
+    return [c async for c in stream_local_chat(FakeGraph(chunks), "hi", "123")]
+
+
+@pytest.mark.asyncio
+async def test_text_before_a_tool_call_is_retracted():
+    out = await _collect(
+        [
+            _text("a", "Let me "),
+            _text("a", "check"),
+            _tool_call("a"),
+            _text("a", " ignored"),
+            ("tools", AIMessageChunk(id="s", content="review summarizer")),
+            _text("b", "Reviews are good."),
+        ]
+    )
+
+    assert out == ["Let me ", "check", StreamReset(""), "Reviews are good."]
+
+
+@pytest.mark.asyncio
+async def test_retraction_keeps_earlier_messages():
+    out = await _collect(
+        [
+            _text("a", "Hello."),
+            _text("b", "Checking"),
+            _tool_call("b"),
+            _text("c", "Done."),
+        ]
+    )
+
+    assert out == ["Hello.", "\n\nChecking", StreamReset("Hello."), "\n\nDone."]
+
+
+@pytest.mark.asyncio
+async def test_tool_call_without_text_streams_nothing():
+    out = await _collect([_tool_call("a"), _text("b", "Answer")])
+
+    assert out == ["Answer"]
@@ -0,0 +1,18 @@
+from api.routers import telegram, whatsapp
+
+
+def test_telegram_update_is_keyed_by_its_chat_thread():
+    update = {"update_id": 1, "edited_message": {"chat": {"id": 42}, "text": "hi"}}
+
+    assert telegram._thread_keys(update) == ["tg:42"]
+    assert telegram._thread_keys({"update_id": 2}) == []
+
+
+def test_whatsapp_messages_are_keyed_by_sender_thread():
+    messages = [
+        {"from": "+1 555 0001", "text": {"body": "a"}},
+        {"from": "15550002", "text": {"body": "b"}},
+        {"text": {"body": "no sender"}},
+    ]
+
+    assert whatsapp._thread_keys(messages) == ["whatsapp:+15550001", "whatsapp:15550002"]
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from utils.thread_mailbox import ThreadMailbox, TurnCancelledError
+
+
+async def _run(mailbox, thread_id, text, seen, started=None, release=None, error=None):
+    async with mailbox.turn(thread_id, text) as merged:
+        seen.append(merged)
+        if merged is not None and started is not None:
+            started.set()
+            await release.wait()
+        if merged is not None and error is not None:
+            raise error
+    return merged
+
+
+@pytest.mark.asyncio
+async def test_single_message_runs_alone():
+    mailbox = ThreadMailbox()
+    seen = []
+
+    assert await _run(mailbox, "t", "hello", seen) == "hello"
+    assert seen == ["hello"]
+    assert mailbox._boxes == {}
+
+
+@pytest.mark.asyncio
+async def test_messages_arriving_during_a_turn_are_merged():
+    mailbox = ThreadMailbox()
+    seen = []
+    started, release = asyncio.Event(), asyncio.Event()
+
+    first = asyncio.create_task(_run(mailbox, "t", "one", seen, started, release))
+    await started.wait()
+    second = asyncio.create_task(_run(mailbox, "t", "two", seen))
+    third = asyncio.create_task(_run(mailbox, "t", "three", seen))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(first, second, third) == ["one", "two\nthree", None]
+    assert seen == ["one", "two\nthree", None]
+    assert mailbox._boxes == {}
+
+
+@pytest.mark.asyncio
+async def test_other_threads_are_not_blocked():
+    mailbox = ThreadMailbox()
+    seen = []
+    started, release = asyncio.Event(), asyncio.Event()
+
+    first = asyncio.create_task(_run(mailbox, "a", "one", seen, started, release))
+    await started.wait()
+
+    assert await _run(mailbox, "b", "two", seen) == "two"
+    release.set()
+    await first
+
+
+@pytest.mark.asyncio
+async def test_merged_callers_get_the_owning_turns_error():
+    mailbox = ThreadMailbox()
+    seen = []
+    started, release = asyncio.Event(), asyncio.Event()
+    gate_started, gate_release = asyncio.Event(), asyncio.Event()
+
+    first = asyncio.create_task(_run(mailbox, "t", "one", seen, gate_started, gate_release))
+    await gate_started.wait()
+    second = asyncio.create_task(
+        _run(mailbox, "t", "two", seen, started, release, error=ValueError("boom"))
+    )
+    third = asyncio.create_task(_run(mailbox, "t", "three", seen))
+    await asyncio.sleep(0)
+    gate_release.set()
+    await started.wait()
+    release.set()
+
+    assert await first == "one"
+    with pytest.raises(ValueError, match="boom"):
+        await second
+    with pytest.raises(ValueError, match="boom"):
+        await third
+
+
+@pytest.mark.asyncio
+async def test_cancelled_turn_fails_the_merged_callers():
+    mailbox = ThreadMailbox()
+    seen = []
+    gate_started, gate_release = asyncio.Event(), asyncio.Event()
+    started = asyncio.Event()
+
+    first = asyncio.create_task(_run(mailbox, "t", "one", seen, gate_started, gate_release))
+    await gate_started.wait()
+    second = asyncio.create_task(_run(mailbox, "t", "two", seen, started, asyncio.Event()))
+    third = asyncio.create_task(_run(mailbox, "t", "three", seen))
+    await asyncio.sleep(0)
+    gate_release.set()
+    await started.wait()
+    second.cancel()
+
+    await first
+    with pytest.raises(asyncio.CancelledError):
+        await second
+    with pytest.raises(TurnCancelledError):
+        await third
+    assert mailbox._boxes == {}
+
+
+@pytest.mark.asyncio
+async def test_caller_cancelled_while_waiting_drops_its_message():
+    mailbox = ThreadMailbox()
+    seen = []
+    started, release = asyncio.Event(), asyncio.Event()
+
+    first = asyncio.create_task(_run(mailbox, "t", "one", seen, started, release))
+    await started.wait()
+    second = asyncio.create_task(_run(mailbox, "t", "two", seen))
+    third = asyncio.create_task(_run(mailbox, "t", "three", seen))
+    await asyncio.sleep(0)
+    second.cancel()
+    release.set()
+
+    assert await first == "one"
+    assert await third == "three"
+    with pytest.raises(asyncio.CancelledError):
+        await second
@@ -0,0 +1,99 @@
+from api.schemas import empty_turn_index, update_turn_index
+
+
+def _extend(entries, start=0):
+    return {"op": "extend", "start": start, "entries": entries}
+
+
+def _index(counts, tokens, compacted=0):
+    return {
+        "counts": counts,
+        "tokens": tokens,
+        "indexed": sum(counts),
+        "total_tokens": sum(tokens),
+        "compacted": compacted,
+    }
+
+
+def test_extend_starts_a_turn_at_each_human_message():
+    index = update_turn_index(
+        None, _extend([(True, 5), (False, 7), (False, 3), (True, 4), (False, 6)])
+    )
+
+    assert index == _index([3, 2], [15, 10])
+
+
+def test_extend_skips_messages_already_indexed():
+    index = _index([2], [10])
+
+    # Entries from position 1 on; position 1 is already covered.
+    index = update_turn_index(index, _extend([(False, 5), (True, 4), (False, 1)], start=1))
+
+    assert index == _index([2, 2], [10, 5])
+
+
+def test_extend_without_a_leading_human_message_opens_a_turn():
+    index = update_turn_index(None, _extend([(False, 3), (False, 2)]))
+
+    assert index == _index([2], [5])
+
+
+def test_drop_removes_the_oldest_turns_and_shifts_the_watermark():
+    index = _index([2, 3, 2], [10, 20, 5], compacted=2)
+
+    index = update_turn_index(index, {"op": "drop", "turns": 1})
+
+    assert index == _index([3, 2], [20, 5], compacted=1)
+
+    index = update_turn_index(index, {"op": "drop", "turns": 2})
+
+    assert index == empty_turn_index()
+
+
+def test_adjust_changes_one_turn_and_the_total():
+    index = _index([2, 2], [10, 20])
+
+    index = update_turn_index(index, {"op": "adjust", "turn": 0, "tokens": -4})
+
+    assert index == _index([2, 2], [6, 20])
+
+
+def test_compacted_only_moves_the_watermark_forward():
+    index = _index([2, 2, 2], [1, 1, 1])
+
+    index = update_turn_index(index, {"op": "compacted", "turns": 2})
+    assert index["compacted"] == 2
+
+    index = update_turn_index(index, {"op": "compacted", "turns": 1})
+    assert index["compacted"] == 2
+
+
+def test_reset_replaces_the_index():
+    rebuilt = _index([1], [3])
+
+    assert update_turn_index(_index([2, 2], [5, 5]), {"op": "reset", "index": rebuilt}) == rebuilt
+    assert update_turn_index(_index([2], [5]), {"op": "reset", "index": None}) == empty_turn_index()
+
+
+def test_list_of_ops_is_applied_in_order_and_empty_ops_are_skipped():
+    index = _index([2, 2], [10, 20])
+
+    index = update_turn_index(
+        index,
+        [
+            None,
+            _extend([(True, 1), (False, 1)], start=4),
+            {"op": "drop", "turns": 2},
+            {"op": "compacted", "turns": 1},
+        ],
+    )
+
+    assert index == _index([2], [2], compacted=1)
+
+
+def test_index_without_watermark_from_older_checkpoints():
+    old = {"counts": [2], "tokens": [10], "indexed": 2, "total_tokens": 10}
+
+    index = update_turn_index(old, _extend([(True, 3)], start=2))
+
+    assert index == _index([2, 1], [10, 3], compacted=0)
@@ -1,8 +1,11 @@
+from typing import Annotated
 from langchain_core.tools import tool
-from data.db import get_product_reviews as _get_product_reviews
+from langgraph.prebuilt import InjectedState
 from api.schemas import (
+    ProductBatchDetails,
     ProductDetails,
     ProductDetailItem,
+    ProductMatchItem,
     ReviewItem,
     ReviewResults,
     ReviewResponse,
@@ -12,29 +15,68 @@ from api.schemas import (
 )
 from pydantic import BaseModel, Field
 from langchain_core.messages import HumanMessage, SystemMessage
-from utils.llm_provider import get_llm
-from data.db import (
-    get_products_by_title,
-    get_products_by_category,
-    list_tag_categories,
-    search_products_hybrid,
-)
+from langchain_core.runnables import RunnableConfig
+from utils.llm_provider import get_shared_llm
+from utils.llm_scheduler import llm_scheduler, priority_from_config
+from data.catalog import get_catalog
+from data.db import PRODUCT_DETAIL_FIELDS, product_columns
+from data.entity_matcher import normalize
 
 
-@tool
-def get_product_by_name(product_name: str) -> dict:
+class ProductLookupArgs(BaseModel):
+    product_name: str = Field(
+        ..., description="Product title, for example: 'Essence Mascara'."
+    )
+    fields: list[str] | None = Field(
+        default=None,
+        description=(
+            "Only the product fields the user asked about, for example ['price'] "
+            "or ['stock', 'availability_status']. Allowed: "
+            + ", ".join(PRODUCT_DETAIL_FIELDS)
+            + ". Omit for full details."
+        ),
+    )
+
+
+def _prefetched_products(state: dict | None, product_name: str | None) -> list[dict]:
+    """Rows the tool router already resolved for this name in the current turn."""
+    prefetched = (state or {}).get("prefetched") or {}
+    return list(prefetched.get("products", {}).get(normalize(product_name), []))
+
+
+def _prefetched_reviews(state: dict | None, product_id: int) -> list[dict] | None:
+    prefetched = (state or {}).get("prefetched") or {}
+    return prefetched.get("reviews", {}).get(str(product_id))
+
+
+@tool(args_schema=ProductLookupArgs)
+async def get_product_by_name(
+    product_name: str,
+    fields: list[str] | None = None,
+    state: Annotated[dict | None, InjectedState] = None,
+) -> dict:
     """Fetch specifications, pricing, and stock status ONLY for a specific, known product name.
 
     Use this tool EXCLUSIVELY when the user asks about a concrete product title they already mentioned or know (e.g., "Essence Mascara", "kiwi").
     Do NOT use this tool for category wise product discovery.
     This tool is strictly for retrieving data on a single, identified product.
     """
-    # Try exact title match first
-    products = get_products_by_title(product_name, limit=5)
+    catalog = get_catalog()
+    products = _prefetched_products(state, product_name)
+    if products:
+        columns = product_columns(fields)
+        products = [{c: p[c] for c in columns if c in p} for p in products]
+    else:
+        # Try exact title match first
+        products = await catalog.get_products_by_title(
+            product_name, limit=5, fields=fields
+        )
 
     # If no exact match, fallback to hybrid search to be more helpful
     if not products:
-        products = search_products_hybrid(product_name, limit=5)
+        products = await catalog.search_products_hybrid(
+            product_name, limit=5, fields=fields
+        )
 
     if not products:
         return ProductDetails(items=[]).model_dump()
@@ -43,44 +85,106 @@ def get_product_by_name(product_name: str) -> dict:
     for product in products:
         items.append(
             ProductDetailItem(
-                id=product.get("id"),
-                title=product.get("title"),
-                brand=product.get("brand"),
-                category=product.get("category"),
-                price=product.get("price"),
-                rating=product.get("rating"),
-                stock=product.get("stock"),
-                availability_status=product.get("availability_status"),
-                shipping_information=product.get("shipping_information"),
-                return_policy=product.get("return_policy"),
-                warranty_information=product.get("warranty_information"),
-                sku=product.get("sku"),
-                dimensions=product.get("dimensions"),
-                weight=product.get("weight"),
-                minimum_order_quantity=product.get("minimum_order_quantity"),
+                **{k: product[k] for k in PRODUCT_DETAIL_FIELDS if k in product}
             )
         )
-    return ProductDetails(items=items).model_dump()
+    details = ProductDetails(items=items)
+    if fields:
+        # Leave out the columns that weren't selected instead of sending nulls.
+        return {
+            "type": details.type,
+            "items": [item.model_dump(exclude_unset=True) for item in items],
+        }
+    return details.model_dump()
+
+
+class ProductBatchArgs(BaseModel):
+    product_names: list[str] = Field(
+        ...,
+        description="Product titles to look up together, for example: ['Essence Mascara', 'Red Lipstick'].",
+    )
+    fields: list[str] | None = Field(
+        default=None,
+        description=(
+            "Only the product fields needed for the answer, for example ['price']. "
+            "Allowed: " + ", ".join(PRODUCT_DETAIL_FIELDS) + ". Omit for full details."
+        ),
+    )
+
+
+# Names resolved per call; keeps one request from scanning for dozens.
+MAX_BATCH_PRODUCTS = 10
+
+
+@tool(args_schema=ProductBatchArgs)
+async def get_products_by_names(
+    product_names: list[str], fields: list[str] | None = None
+) -> dict:
+    """Fetch specifications, pricing, and stock status for SEVERAL specific products at once.
+
+    Use this tool when the user mentions two or more concrete product titles in one question, such as comparisons ("compare the mascara and the lipstick", "which is cheaper, kiwi or apple?").
+    Pass all product names in a single call instead of looking them up one by one.
+    """
+    names = [n for n in product_names if isinstance(n, str) and n.strip()]
+    if not names:
+        return ErrorResponse(
+            message="Please provide at least one product name."
+        ).model_dump()
+
+    rows = await get_catalog().get_products_by_names(
+        names[:MAX_BATCH_PRODUCTS], fields=fields
+    )
+    items = [
+        ProductMatchItem(
+            **{k: row[k] for k in PRODUCT_DETAIL_FIELDS if k in row},
+            requested_name=row.get("requested_name"),
+            exact_title_match=row.get("exact_title_match"),
+        )
+        for row in rows
+    ]
+    found = {(item.requested_name or "").lower() for item in items}
+    details = ProductBatchDetails(
+        items=items,
+        not_found=[n for n in names[:MAX_BATCH_PRODUCTS] if n.strip().lower() not in found],
+    )
+    if fields:
+        # Leave out the columns that weren't selected instead of sending nulls.
+        return {
+            "type": details.type,
+            "items": [item.model_dump(exclude_unset=True) for item in items],
+            "not_found": details.not_found,
+        }
+    return details.model_dump()
 
 
 @tool
-def get_product_reviews(
-    product_name: str | None = None, product_id: int | None = None
+async def get_product_reviews(
+    config: RunnableConfig,
+    product_name: str | None = None,
+    product_id: int | None = None,
+    state: Annotated[dict | None, InjectedState] = None,
 ) -> dict:
     """Retrieve customer feedback, ratings, and sentiment for a product.
 
     Use this when the user asks "What do people think about this?", "Show me reviews for product kiwi", or "Is this product any good?".
     If only a product name is provided, the tool will look up the product ID first.
     """
+    catalog = get_catalog()
     if product_id is None:
         if not product_name:
             return ErrorResponse(
                 message="Please provide a product name or product ID to fetch reviews."
             ).model_dump()
 
-        products = get_products_by_title(product_name, limit=1)
+        products = _prefetched_products(state, product_name)[:1]
         if not products:
-            products = search_products_hybrid(product_name, limit=1)
+            products = await catalog.get_products_by_title(
+                product_name, limit=1, fields=["id"]
+            )
+        if not products:
+            products = await catalog.search_products_hybrid(
+                product_name, limit=1, fields=["id"]
+            )
 
         if not products:
             return ErrorResponse(
@@ -93,7 +197,9 @@ def get_product_reviews(
                 message=f"Product '{product_name}' was found, but its ID is missing."
             ).model_dump()
 
-    rows = _get_product_reviews(product_id, limit=5)
+    rows = _prefetched_reviews(state, product_id)
+    if rows is None:
+        rows = await catalog.get_product_reviews(product_id, limit=5)
     if not rows:
         return ReviewResults(product_id=product_id, items=[]).model_dump()
     items = []
@@ -104,7 +210,10 @@ def get_product_reviews(
             )
         )
 
-    summary = _summarize_reviews([i.comment for i in items if i.comment])
+    # Same priority as the conversation turn that asked for the reviews.
+    summary = await _summarize_reviews(
+        [i.comment for i in items if i.comment], priority_from_config(config)
+    )
     return ReviewResponse(summary=summary).model_dump()
 
 
@@ -115,11 +224,11 @@ class CategoryArgs(BaseModel):
     )
 
 
-def _summarize_reviews(comments: list[str]) -> str | None:
+async def _summarize_reviews(comments: list[str], priority: str) -> str | None:
     if not comments:
         return None
 
-    llm = get_llm()
+    llm = get_shared_llm()
     system_prompt = (
         "You summarize customer review comments. "
         "Write 2-3 concise sentences about overall review summary of the product. "
@@ -127,11 +236,13 @@ def _summarize_reviews(comments: list[str]) -> str | None:
     )
     human_prompt = "Reviews:\n" + "\n".join(f"- {c}" for c in comments)
     try:
-        response = llm.invoke(
+        response = await llm_scheduler.ainvoke(
+            llm,
             [
                 SystemMessage(content=system_prompt),
                 HumanMessage(content=human_prompt),
-            ]
+            ],
+            priority=priority,
         )
     except Exception:
         return None
@@ -143,20 +254,20 @@ def _summarize_reviews(comments: list[str]) -> str | None:
 
 
 @tool
-def get_tag_categories() -> dict:
+async def get_tag_categories() -> dict:
     """List the types of products, departments, or categories available in the store.
 
     Use this when the user asks "What products do you sell?", "What categories do you have?", "What types of items are available?", or "Show me the store departments".
     This is the best tool for an overview of the store's inventory structure and departments.
     """
-    categories = list_tag_categories()
+    categories = await get_catalog().list_tag_categories()
     if not categories:
         return CategoryList(items=[]).model_dump()
     return CategoryList(items=categories).model_dump()
 
 
 @tool(args_schema=CategoryArgs)
-def get_products_in_category(category: str) -> dict:
+async def get_products_in_category(category: str) -> dict:
     """List all products belonging to a specific category or department name.
 
     Use this when the user wants to see everything in a category (e.g., "Show me all beauty products", "What items are in the groceries category?").
@@ -168,7 +279,7 @@ def get_products_in_category(category: str) -> dict:
         ).model_dump()
     category = category.strip()
 
-    products = get_products_by_category(category, limit=30)
+    products = await get_catalog().get_products_by_category(category, limit=30)
     if not products:
         return CategoryProducts(category=category, items=[]).model_dump()
     items = []
@@ -179,6 +290,7 @@ def get_products_in_category(category: str) -> dict:
 
 TOOLS = [
     get_product_by_name,
+    get_products_by_names,
     get_product_reviews,
     get_tag_categories,
     get_products_in_category,
@@ -0,0 +1,113 @@
+import os
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+from utils import metrics
+
+load_dotenv()
+
+AGENT_MAX_IN_FLIGHT = int(os.getenv("AGENT_MAX_IN_FLIGHT", "4"))
+AGENT_MAX_QUEUE = int(os.getenv("AGENT_MAX_QUEUE", "32"))
+AGENT_QUEUE_TIMEOUT = float(os.getenv("AGENT_QUEUE_TIMEOUT", "30"))
+
+BUSY_MESSAGE = (
+    "We're handling a lot of requests right now. "
+    "Please try again in a moment."
+)
+
+
+class AgentBusyError(RuntimeError):
+    """Raised when a graph run is rejected by admission control."""
+
+
+class AdmissionController:
+    """
+    Caps concurrent graph runs and bounds the queue in front of them.
+
+    Runs beyond max_in_flight wait in FIFO order; when max_queue runs are
+    already waiting, or a run waits longer than queue_timeout, it is rejected
+    with AgentBusyError so callers can answer "busy" right away.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = AGENT_MAX_IN_FLIGHT,
+        max_queue: int = AGENT_MAX_QUEUE,
+        queue_timeout: float = AGENT_QUEUE_TIMEOUT,
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._capacity_changed = asyncio.Event()
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("admission_in_flight", self._in_flight)
+        metrics.set_gauge("admission_queue_depth", len(self._waiters))
+
+    def has_capacity(self) -> bool:
+        return self._in_flight < self.max_in_flight and not self._waiters
+
+    async def wait_for_capacity(self) -> None:
+        """Return once a run would be admitted without queueing."""
+        while not self.has_capacity():
+            self._capacity_changed.clear()
+            await self._capacity_changed.wait()
+
+    def _reject(self, reason: str) -> AgentBusyError:
+        metrics.increment("admission_rejected")
+        metrics.increment(f"admission_rejected_{reason}")
+        return AgentBusyError(reason)
+
+    async def _acquire(self) -> None:
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._update_gauges()
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject("timeout")
+        except asyncio.CancelledError:
+            # A slot may have been handed over just before the cancellation.
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+                self._capacity_changed.set()
+
+    def _release(self) -> None:
+        # Hand the slot straight to the oldest live waiter, if any.
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self._in_flight -= 1
+        self._capacity_changed.set()
+
+    @asynccontextmanager
+    async def admit(self):
+        started = time.monotonic()
+        await self._acquire()
+        metrics.observe("admission_queue_wait_seconds", time.monotonic() - started)
+        self._update_gauges()
+        try:
+            yield
+        finally:
+            self._release()
+            self._update_gauges()
+
+
+admission = AdmissionController()
@@ -0,0 +1,110 @@
+import os
+import json
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from utils import metrics
+
+load_dotenv(".env", override=False)
+
+# Rough chars-per-token ratio; the local models don't expose a tokenizer,
+# and ~4 characters per token is close enough for English and JSON.
+CONTEXT_CHARS_PER_TOKEN = float(os.getenv("CONTEXT_CHARS_PER_TOKEN", "4"))
+# Fixed per-message cost for role markers and chat-template tokens.
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def _default_budget() -> int:
+    if os.getenv("LLM_PROVIDER", "ollama").strip().lower() == "groq":
+        return 8192
+    num_ctx = int(os.getenv("OLLAMA_NUM_CTX") or "2048")
+    num_predict = int(os.getenv("OLLAMA_NUM_PREDICT") or "1024")
+    # Leave room in the context window for the reply.
+    return max(512, num_ctx - num_predict)
+
+
+# Prompt tokens allowed per assistant call (system prompt, summary,
+# messages and tool schemas together).
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET") or _default_budget())
+# Compact history in the background once the stored messages exceed this,
+# keeping the most recent turns that fit in SUMMARY_KEEP_TOKENS verbatim.
+SUMMARY_TRIGGER_TOKENS = int(
+    os.getenv("SUMMARY_TRIGGER_TOKENS") or CONTEXT_TOKEN_BUDGET // 2
+)
+SUMMARY_KEEP_TOKENS = int(os.getenv("SUMMARY_KEEP_TOKENS") or CONTEXT_TOKEN_BUDGET // 4)
+if SUMMARY_KEEP_TOKENS >= SUMMARY_TRIGGER_TOKENS:
+    SUMMARY_KEEP_TOKENS = SUMMARY_TRIGGER_TOKENS // 2
+
+
+_budget_warned = False
+
+
+def history_budget(fixed_tokens: int) -> int:
+    """
+    Tokens left for history once the system prompt and tool schemas are
+    counted, but never less than SUMMARY_KEEP_TOKENS: a budget the fixed part
+    alone fills is misconfigured, and silently sending only the current turn
+    would drop the conversation.
+    """
+    available = CONTEXT_TOKEN_BUDGET - fixed_tokens
+    if available >= SUMMARY_KEEP_TOKENS:
+        return available
+    global _budget_warned
+    if not _budget_warned:
+        _budget_warned = True
+        print(
+            f"WARNING: CONTEXT_TOKEN_BUDGET ({CONTEXT_TOKEN_BUDGET}) leaves "
+            f"{available} tokens for history after the system prompt and tool "
+            f"schemas (~{fixed_tokens}); keeping {SUMMARY_KEEP_TOKENS} tokens of "
+            "history instead. Raise OLLAMA_NUM_CTX or CONTEXT_TOKEN_BUDGET."
+        )
+    metrics.increment("prompt_budget_floor_hits")
+    return SUMMARY_KEEP_TOKENS
+
+
+def estimate_tokens(text: str | None) -> int:
+    if not text:
+        return 0
+    return int(len(text) / CONTEXT_CHARS_PER_TOKEN) + 1
+
+
+def _content_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts: list[str] = []
+        for part in content:
+            if isinstance(part, str):
+                parts.append(part)
+            elif isinstance(part, dict) and "text" in part:
+                parts.append(str(part["text"]))
+            else:
+                parts.append(json.dumps(part, default=str))
+        return " ".join(parts)
+    if content is None:
+        return ""
+    return json.dumps(content, default=str)
+
+
+def message_tokens(message: BaseMessage) -> int:
+    tokens = _MESSAGE_OVERHEAD_TOKENS + estimate_tokens(_content_text(message.content))
+    if isinstance(message, AIMessage) and message.tool_calls:
+        tokens += estimate_tokens(json.dumps(message.tool_calls, default=str))
+    return tokens
+
+
+def tool_schema_tokens(tools: list) -> int:
+    if not tools:
+        return 0
+    schemas = [convert_to_openai_tool(t) for t in tools]
+    return estimate_tokens(json.dumps(schemas))
+
+
+def record_prompt_size(tokens: int, trimmed_messages: int = 0) -> None:
+    metrics.observe("prompt_tokens", tokens)
+    metrics.set_gauge("prompt_token_budget", CONTEXT_TOKEN_BUDGET)
+    if tokens > CONTEXT_TOKEN_BUDGET:
+        metrics.increment("prompt_over_budget")
+    if trimmed_messages:
+        metrics.increment("prompt_trimmed_messages", trimmed_messages)
@@ -57,3 +57,19 @@ def get_llm():
         num_ctx=_get_env_int("OLLAMA_NUM_CTX", 2048),
         streaming=True,
     )
+
+
+_llm = None
+
+
+def set_llm(llm) -> None:
+    global _llm
+    _llm = llm
+
+
+def get_shared_llm():
+    """Return the process-wide LLM client, building it on first use."""
+    global _llm
+    if _llm is None:
+        _llm = get_llm()
+    return _llm
@@ -0,0 +1,155 @@
+import os
+import time
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+
+from utils import metrics
+
+load_dotenv()
+
+# Priority classes, most urgent first.
+INTERACTIVE = "interactive"
+WEBHOOK = "webhook"
+BACKGROUND = "background"
+PRIORITY_CLASSES = (INTERACTIVE, WEBHOOK, BACKGROUND)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+LLM_CLASS_CONCURRENCY = {
+    INTERACTIVE: int(os.getenv("LLM_INTERACTIVE_CONCURRENCY", "2")),
+    WEBHOOK: int(os.getenv("LLM_WEBHOOK_CONCURRENCY", "2")),
+    BACKGROUND: int(os.getenv("LLM_BACKGROUND_CONCURRENCY", "1")),
+}
+# A waiting call is promoted one class for every this many seconds it waits.
+LLM_PRIORITY_AGING_SECONDS = float(os.getenv("LLM_PRIORITY_AGING_SECONDS", "10"))
+
+# Key under config["configurable"] carrying the caller's priority class.
+PRIORITY_CONFIG_KEY = "llm_priority"
+
+
+def priority_from_config(config: dict | None, default: str = WEBHOOK) -> str:
+    configurable = (config or {}).get("configurable") or {}
+    priority = configurable.get(PRIORITY_CONFIG_KEY, default)
+    return priority if priority in PRIORITY_CLASSES else default
+
+
+@dataclass
+class _Waiter:
+    priority: str
+    seq: int
+    enqueued: float = field(default_factory=time.monotonic)
+    future: asyncio.Future | None = None
+
+
+class LLMScheduler:
+    """
+    Orders LLM calls by priority class so live replies don't queue behind
+    background work on the same model server.
+
+    At most max_concurrency calls run at once, and each class has its own
+    cap. When a slot frees up it goes to the most urgent waiter whose class
+    still has room; a waiter's class improves by one level for every
+    aging_seconds it has waited, so background work is never starved.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        class_concurrency: dict[str, int] | None = None,
+        aging_seconds: float = LLM_PRIORITY_AGING_SECONDS,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.class_concurrency = dict(class_concurrency or LLM_CLASS_CONCURRENCY)
+        self.aging_seconds = aging_seconds
+        self._running = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+
+    def _total_running(self) -> int:
+        return sum(self._running.values())
+
+    def _has_room(self, priority: str) -> bool:
+        return (
+            self._total_running() < self.max_concurrency
+            and self._running[priority] < max(1, self.class_concurrency.get(priority, 1))
+        )
+
+    def _rank(self, waiter: _Waiter, now: float) -> tuple[float, int]:
+        level = PRIORITY_CLASSES.index(waiter.priority)
+        if self.aging_seconds > 0:
+            level -= (now - waiter.enqueued) / self.aging_seconds
+        return level, waiter.seq
+
+    def _update_gauges(self) -> None:
+        for priority in PRIORITY_CLASSES:
+            metrics.set_gauge(f"llm_in_flight_{priority}", self._running[priority])
+            metrics.set_gauge(
+                f"llm_queue_depth_{priority}",
+                sum(1 for w in self._waiters if w.priority == priority),
+            )
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        while self._waiters:
+            eligible = [w for w in self._waiters if self._has_room(w.priority)]
+            if not eligible:
+                break
+            waiter = min(eligible, key=lambda w: self._rank(w, now))
+            self._waiters.remove(waiter)
+            if waiter.future.done():
+                continue
+            promoted = PRIORITY_CLASSES.index(waiter.priority) - self._rank(waiter, now)[0]
+            if promoted >= 1:
+                # Granted ahead of its class thanks to aging.
+                metrics.increment("llm_aged_grants")
+            self._running[waiter.priority] += 1
+            waiter.future.set_result(None)
+        self._update_gauges()
+
+    def _release(self, priority: str) -> None:
+        self._running[priority] -= 1
+        self._dispatch()
+
+    async def _acquire(self, priority: str) -> None:
+        if not self._waiters and self._has_room(priority):
+            self._running[priority] += 1
+            self._update_gauges()
+            return
+
+        waiter = _Waiter(priority=priority, seq=next(self._seq))
+        waiter.future = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        # Someone else's class may have room even though waiters are queued.
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._update_gauges()
+            elif waiter.future.done() and not waiter.future.cancelled():
+                # The slot was granted just before the cancellation.
+                self._release(priority)
+            raise
+
+    @asynccontextmanager
+    async def slot(self, priority: str = WEBHOOK):
+        """Hold one LLM slot for the duration of the block."""
+        if priority not in PRIORITY_CLASSES:
+            priority = WEBHOOK
+        started = time.monotonic()
+        await self._acquire(priority)
+        metrics.observe(f"llm_queue_wait_seconds_{priority}", time.monotonic() - started)
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    async def ainvoke(self, llm, messages, priority: str = WEBHOOK, config=None):
+        async with self.slot(priority):
+            return await llm.ainvoke(messages, config=config)
+
+
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,42 @@
+import threading
+from collections import defaultdict
+
+
+_lock = threading.Lock()
+_counters: dict[str, float] = defaultdict(float)
+_gauges: dict[str, float] = {}
+_observations: dict[str, dict[str, float]] = {}
+
+
+def increment(name: str, value: float = 1.0) -> None:
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, value: float) -> None:
+    """
+    Record a sample (typically a duration in seconds) as count/total/max/last.
+    """
+    with _lock:
+        stats = _observations.get(name)
+        if stats is None:
+            stats = {"count": 0, "total": 0.0, "max": value, "last": value}
+            _observations[name] = stats
+        stats["count"] += 1
+        stats["total"] += value
+        stats["max"] = max(stats["max"], value)
+        stats["last"] = value
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "observations": {k: dict(v) for k, v in _observations.items()},
+        }
@@ -0,0 +1,116 @@
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from utils import metrics
+
+
+class TurnCancelledError(RuntimeError):
+    """The turn that took a merged message was cancelled before replying."""
+
+
+@dataclass
+class _Message:
+    text: str
+    # Outcome of the turn that took this message.
+    future: asyncio.Future = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+
+
+@dataclass
+class _Mailbox:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    pending: list[_Message] = field(default_factory=list)
+    users: int = 0
+
+
+class ThreadMailbox:
+    """
+    Serializes agent runs per conversation thread and coalesces messages.
+
+    Only one run per thread executes at a time. Messages that arrive while a
+    run is in progress wait in the thread's mailbox; the first waiter to get
+    the next turn takes all of them as one merged message and the others are
+    told their text was folded into that turn. If that turn fails, the
+    others get its exception too, so none of the merged messages is lost.
+
+    This only covers one process. Across worker processes, job claiming keeps
+    one run per thread (see CLAIM_JOB_SQL in data/job_queue.py).
+    """
+
+    def __init__(self):
+        self._boxes: dict[str, _Mailbox] = {}
+
+    def _checkout(self, thread_id: str) -> _Mailbox:
+        box = self._boxes.get(thread_id)
+        if box is None:
+            box = _Mailbox()
+            self._boxes[thread_id] = box
+        box.users += 1
+        return box
+
+    def _release(self, thread_id: str, box: _Mailbox) -> None:
+        box.users -= 1
+        if box.users == 0:
+            self._boxes.pop(thread_id, None)
+
+    @asynccontextmanager
+    async def turn(self, thread_id: str, text: str):
+        """
+        Yield the (possibly merged) text this caller should run, or None when
+        the message was taken by another caller's turn that has succeeded.
+        Raises that turn's exception when it failed.
+        """
+        box = self._checkout(thread_id)
+        message = _Message(text)
+        box.pending.append(message)
+        try:
+            try:
+                await box.lock.acquire()
+            except asyncio.CancelledError:
+                if message in box.pending:
+                    box.pending.remove(message)
+                raise
+            if message not in box.pending:
+                # An earlier turn took this text and has already finished.
+                box.lock.release()
+                await message.future
+                yield None
+                return
+
+            taken = list(box.pending)
+            box.pending.clear()
+            if len(taken) > 1:
+                metrics.increment("thread_messages_coalesced", len(taken) - 1)
+            others = [m for m in taken if m is not message]
+            try:
+                yield "\n".join(m.text for m in taken)
+            except asyncio.CancelledError:
+                for other in others:
+                    other.future.set_exception(TurnCancelledError(thread_id))
+                raise
+            except BaseException as e:
+                for other in others:
+                    other.future.set_exception(e)
+                raise
+            else:
+                for other in others:
+                    other.future.set_result(None)
+            finally:
+                box.lock.release()
+        finally:
+            self._release(thread_id, box)
+
+    @asynccontextmanager
+    async def exclusive(self, thread_id: str):
+        """Hold the thread without taking messages (e.g. to clear history)."""
+        box = self._checkout(thread_id)
+        try:
+            async with box.lock:
+                yield
+        finally:
+            self._release(thread_id, box)
+
+
+thread_mailbox = ThreadMailbox()
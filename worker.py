@@ -0,0 +1,178 @@
+import os
+import sys
+import signal
+import asyncio
+from dotenv import load_dotenv
+
+from agent import AgentRuntime, build_runtime, wait_for_compaction
+from api.routers.telegram import process_telegram_update
+from api.routers.whatsapp import process_whatsapp_message
+from api.services.http_client import OutboundClient, set_http_client
+from api.services.outbound import telegram_outbound, whatsapp_outbound
+from data.catalog_listener import start_catalog_listener
+from data.db_pool import create_async_pool
+from data.job_queue import (
+    JobReplies,
+    PartialJobFailure,
+    claim_job,
+    complete_job,
+    defer_job,
+    extend_job,
+    fail_job,
+    retry_job,
+    setup_job_queue,
+)
+from utils import metrics
+from utils.admission import AgentBusyError, admission
+
+load_dotenv()
+
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "10"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# Delay before a job rejected by admission control is offered again.
+JOB_BUSY_RETRY_DELAY = float(os.getenv("JOB_BUSY_RETRY_DELAY", "5"))
+
+JOB_HANDLERS = {
+    "telegram": process_telegram_update,
+    "whatsapp": process_whatsapp_message,
+}
+
+
+async def _keep_visible(runtime: AgentRuntime, job_id: int) -> None:
+    # Push the visibility timeout forward while a long LLM run is in progress
+    # so no other worker reclaims the job.
+    while True:
+        await asyncio.sleep(JOB_VISIBILITY_TIMEOUT / 2)
+        try:
+            await extend_job(runtime.pool, job_id, JOB_VISIBILITY_TIMEOUT)
+        except Exception as e:
+            print(f"Could not extend job {job_id}: {e}")
+
+
+async def _record(action, runtime: AgentRuntime, job_id: int, *args) -> None:
+    # Queue bookkeeping must not take the worker loop down. If the update is
+    # lost, the job is reclaimed after its visibility timeout.
+    try:
+        await action(runtime.pool, job_id, *args)
+    except Exception as e:
+        print(f"Could not {action.__name__.replace('_', ' ')} {job_id}: {e}")
+        metrics.increment("job_bookkeeping_errors")
+
+
+async def _process_job(runtime: AgentRuntime, job: dict) -> None:
+    job_id = job["id"]
+    attempts = job["attempts"]
+    handler = JOB_HANDLERS.get(job["platform"])
+    if handler is None:
+        await _record(fail_job, runtime, job_id, f"unknown platform {job['platform']}")
+        metrics.increment("jobs_failed")
+        return
+    if attempts > JOB_MAX_ATTEMPTS:
+        # Reclaimed after its visibility timeout once too often.
+        await _record(fail_job, runtime, job_id, "visibility timeout exceeded")
+        metrics.increment("jobs_failed")
+        return
+
+    heartbeat = asyncio.create_task(_keep_visible(runtime, job_id))
+    try:
+        # Handlers return once the reply has been handed to the platform, so
+        # the job is only deleted after delivery. Replies are saved on the
+        # job as soon as they are generated, so a retry after a failed send
+        # re-sends them instead of running the agent again.
+        replies = JobReplies(runtime.pool, job_id, job.get("replies"))
+        await handler(job["payload"], runtime, replies)
+        # Keep the job's threads claimed until their compaction has written
+        # its checkpoint, so another worker can't run a turn meanwhile.
+        await wait_for_compaction(job.get("thread_keys") or [])
+    except AgentBusyError:
+        # Nothing was answered; leave the job queued instead of replying "busy".
+        print(f"Job {job_id} deferred: agent busy")
+        await _record(defer_job, runtime, job_id, JOB_BUSY_RETRY_DELAY)
+        metrics.increment("jobs_deferred")
+        return
+    except Exception as e:
+        # A partly answered job goes on with just its unanswered part.
+        remaining = None
+        if isinstance(e, PartialJobFailure):
+            remaining, e = e.payload, e.error
+        error = f"{type(e).__name__}: {e}"
+        print(f"Job {job_id} failed (attempt {attempts}): {error}")
+        if attempts >= JOB_MAX_ATTEMPTS:
+            await _record(fail_job, runtime, job_id, error, remaining)
+            metrics.increment("jobs_failed")
+        else:
+            delay = JOB_RETRY_DELAY * (2 ** (attempts - 1))
+            await _record(retry_job, runtime, job_id, error, delay, remaining)
+            metrics.increment("jobs_retried")
+        return
+    finally:
+        heartbeat.cancel()
+
+    await _record(complete_job, runtime, job_id)
+    metrics.increment("jobs_completed")
+
+
+async def _worker_loop(runtime: AgentRuntime, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        # Only claim work this process can start now; the rest stays in
+        # inbound_jobs for this or another worker.
+        try:
+            await asyncio.wait_for(
+                admission.wait_for_capacity(), timeout=JOB_POLL_INTERVAL
+            )
+        except asyncio.TimeoutError:
+            continue
+        try:
+            job = await claim_job(runtime.pool, JOB_VISIBILITY_TIMEOUT)
+        except Exception as e:
+            print(f"Could not claim a job: {e}")
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await _process_job(runtime, job)
+
+
+async def run_worker(concurrency: int = JOB_WORKER_CONCURRENCY) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: fall back to KeyboardInterrupt.
+            pass
+
+    async with create_async_pool() as pool:
+        await setup_job_queue(pool)
+        runtime = await build_runtime(pool)
+        catalog_listener = await start_catalog_listener(pool, runtime.catalog)
+        http_client = OutboundClient()
+        set_http_client(http_client)
+        print(f"Worker started with concurrency={concurrency}")
+        try:
+            # Each loop finishes its current job before exiting on shutdown.
+            await asyncio.gather(
+                *(_worker_loop(runtime, stop) for _ in range(concurrency))
+            )
+        finally:
+            if catalog_listener is not None:
+                await catalog_listener.stop()
+            await runtime.catalog.stop_snapshot()
+            await telegram_outbound.stop()
+            await whatsapp_outbound.stop()
+            await http_client.aclose()
+            set_http_client(None)
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        # psycopg async doesn't work with ProactorEventLoop on Windows.
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(run_worker())